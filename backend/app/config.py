@@ -1,64 +1,103 @@
-from pydantic_settings import BaseSettings
+import os
 from functools import lru_cache
 from typing import Optional
 
+import msgspec
+from dotenv import dotenv_values
 
-class Settings(BaseSettings):
+
+class Settings(msgspec.Struct, frozen=True):
     """Application settings loaded from environment variables."""
-    
+
     # App
     app_name: str = "YenFlowers API"
     debug: bool = False
     api_prefix: str = "/api/v1"
-    
+
     # Database Mode: "supabase" or "postgres"
     # If DATABASE_URL is set, uses direct PostgreSQL
     # Otherwise, uses Supabase client
     database_url: Optional[str] = None
-    
+    # Connection pool sizing (also used for the Supabase HTTP pool). For
+    # Supabase, point DATABASE_URL at the Supavisor session-mode pooler so
+    # workers share server connections.
+    pool_min_size: int = 1
+    pool_max_size: int = 25
+    pool_keepalive_size: int = 15
+    pool_recycle_seconds: int = 1800
+    pool_timeout_seconds: float = 30.0
+    # asyncpg's per-connection prepared statement cache. Set to 0 when
+    # DATABASE_URL goes through a transaction-mode pooler (Supavisor :6543,
+    # PgBouncer), which can't keep prepared statements between transactions.
+    pool_statement_cache_size: int = 100
+
+    # Redis (optional shared cache, e.g. redis://localhost:6379/0)
+    redis_url: str = ""
+
     # Supabase (optional if using DATABASE_URL)
     supabase_url: str = ""
     supabase_anon_key: str = ""
     supabase_service_role_key: str = ""
-    
+
     # Stripe
     stripe_secret_key: str = ""
     stripe_webhook_secret: str = ""
-    
+
     # PayPal
     paypal_client_id: str = ""
     paypal_client_secret: str = ""
     paypal_mode: str = "sandbox"  # sandbox or live
-    
+
     # Facebook
     facebook_page_id: str = ""
     facebook_access_token: str = ""
     facebook_app_id: str = ""
     facebook_app_secret: str = ""
-    
+
     # Instagram
     instagram_access_token: str = ""
-    
+
     # JWT Auth
     jwt_secret_key: str = "yenflowers-secret-key-change-in-production"
     jwt_algorithm: str = "HS256"
     jwt_expiry_hours: int = 24
-    
+
     # CORS
-    cors_origins: list[str] = ["http://localhost:5173", "http://localhost:3000"]
-    
+    cors_origins: list[str] = msgspec.field(
+        default_factory=lambda: ["http://localhost:5173", "http://localhost:3000"]
+    )
+
     @property
     def use_postgres(self) -> bool:
         """Check if using direct PostgreSQL instead of Supabase."""
         return bool(self.database_url)
-    
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        extra = "ignore"  # Ignore unknown env vars
+
+
+# List fields are given as JSON in the environment, e.g. CORS_ORIGINS='["https://..."]'
+_JSON_FIELDS = {"cors_origins"}
+
+
+def load_settings(env_file: str = ".env") -> Settings:
+    """
+    Read settings from the .env file and the process environment (which wins).
+    Variable names are case-insensitive; unknown variables are ignored.
+    """
+    env = {
+        k.lower(): v
+        for k, v in dotenv_values(env_file, encoding="utf-8").items()
+        if v is not None
+    }
+    env.update((k.lower(), v) for k, v in os.environ.items())
+
+    raw = {}
+    for name in Settings.__struct_fields__:
+        if name not in env:
+            continue
+        value = env[name]
+        raw[name] = msgspec.json.decode(value) if name in _JSON_FIELDS else value
+    return msgspec.convert(raw, Settings, strict=False)
 
 
 @lru_cache()
 def get_settings() -> Settings:
-    return Settings()
-
+    return load_settings()
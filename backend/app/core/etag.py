@@ -0,0 +1,29 @@
+"""
+Conditional GET helpers.
+Weak ETags derived from row ids + updated_at, so unchanged data can be
+answered with 304 Not Modified and no body.
+"""
+import hashlib
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+
+
+def weak_etag(rows: Iterable[dict]) -> str:
+    """ETag for a set of rows; changes whenever any row is added, removed or updated."""
+    digest = hashlib.md5(usedforsecurity=False)
+    for row in rows:
+        digest.update(f"{row.get('id')}|{row.get('updated_at')};".encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def not_modified(request: Request, response: Response, rows: Iterable[dict]) -> Optional[Response]:
+    """
+    Set the ETag header on response; return a 304 response if the client's
+    If-None-Match already matches, else None.
+    """
+    etag = weak_etag(rows)
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
@@ -0,0 +1,57 @@
+"""
+Keyset (seek) pagination helpers.
+A cursor is the (sort value, id) of the last row of the previous page, so
+the next page is an index range scan instead of an OFFSET that reads and
+discards every earlier row.
+"""
+import base64
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+import orjson
+from fastapi import HTTPException
+
+
+def encode_cursor(row: dict, column: str) -> Optional[str]:
+    """Opaque cursor pointing just past row; None if its sort value is missing."""
+    value = row.get(column)
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = orjson.dumps([value, str(row["id"])])
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = orjson.loads(base64.urlsafe_b64decode(padded))
+        value = str(value)
+        if '"' in value or "\\" in value:
+            raise ValueError(value)
+        return value, str(UUID(str(row_id)))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def seek(query, column: str, cursor: Optional[str]):
+    """Order by (column, id) DESC and, given a cursor, start right after it."""
+    query = query.order(column, desc=True).order("id", desc=True)
+    if cursor:
+        value, row_id = decode_cursor(cursor)
+        query = query.or_(
+            f'{column}.lt."{value}",and({column}.eq."{value}",id.lt.{row_id})'
+        )
+    return query
+
+
+def next_cursor(rows: list, page_size: int, column: str) -> Optional[str]:
+    """
+    Cursor for the page after rows[:page_size], or None on the last page.
+    Callers fetch page_size + 1 rows; the extra row only signals that more exist.
+    """
+    if len(rows) <= page_size:
+        return None
+    return encode_cursor(rows[page_size - 1], column)
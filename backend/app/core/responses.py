@@ -0,0 +1,24 @@
+"""
+JSON responses encoded straight from rows with orjson.
+Returning these from a route skips FastAPI's jsonable_encoder walk, which is
+the dominant CPU cost for large list pages.
+"""
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+def json_default(value: Any) -> Any:
+    # NUMERIC columns come back as Decimal in DATABASE_URL mode
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class RowsJSONResponse(ORJSONResponse):
+    """ORJSONResponse that also handles Decimal; UUID/datetime are native to orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS)
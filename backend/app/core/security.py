@@ -2,8 +2,11 @@
 Security utilities for authentication.
 JWT token handling and password hashing.
 """
+import hashlib
+import time
 from datetime import datetime, timedelta
 from typing import Optional
+from cachetools import TTLCache
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
@@ -15,11 +18,20 @@ settings = get_settings()
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Successfully verified tokens, keyed by a digest of the raw token. Hits are
+# still checked against the token's own exp; failures are never cached.
+_TOKEN_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=60)
+
+# Digests of tokens revoked by logout in this process, kept for as long as
+# any token can live
+_REVOKED: TTLCache = TTLCache(maxsize=4096, ttl=settings.jwt_expiry_hours * 3600)
+
 
 class TokenData(BaseModel):
     user_id: str
     email: str
     role: str
+    exp: Optional[int] = None
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -50,8 +62,41 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def token_digest(token: str) -> bytes:
+    """Cache key for a token, so raw tokens are never held in memory."""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def revoke_token(token: str) -> None:
+    """Reject this token from now on (until it would have expired anyway)."""
+    key = token_digest(token)
+    _REVOKED[key] = True
+    _TOKEN_CACHE.pop(key, None)
+
+
+def is_token_revoked(key: bytes) -> bool:
+    return key in _REVOKED
+
+
 def decode_token(token: str) -> Optional[TokenData]:
-    """Decode and validate a JWT token."""
+    """Decode and validate a JWT token (verified at most once a minute per token)."""
+    key = token_digest(token)
+    if key in _REVOKED:
+        return None
+    cached = _TOKEN_CACHE.get(key)
+    if cached is not None:
+        if cached.exp is None or cached.exp > time.time():
+            return cached
+        _TOKEN_CACHE.pop(key, None)
+        return None
+    
+    token_data = _decode_token(token)
+    if token_data is not None:
+        _TOKEN_CACHE[key] = token_data
+    return token_data
+
+
+def _decode_token(token: str) -> Optional[TokenData]:
     try:
         payload = jwt.decode(
             token, 
@@ -65,6 +110,11 @@ def decode_token(token: str) -> Optional[TokenData]:
         if user_id is None or email is None:
             return None
         
-        return TokenData(user_id=user_id, email=email, role=role or "customer")
+        return TokenData(
+            user_id=user_id,
+            email=email,
+            role=role or "customer",
+            exp=payload.get("exp"),
+        )
     except JWTError:
         return None
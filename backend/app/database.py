@@ -2,8 +2,27 @@
 Database connection module.
 Supports both Supabase client and direct PostgreSQL connections.
 """
-from typing import Optional, Any
+import hashlib
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from typing import Iterator, Optional, Any
+from uuid import uuid4
+
+import httpx
+import orjson
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
+import psycopg2.sql as sql
+
+from fastapi import Request
+
 from app.config import get_settings
+from app.core.responses import json_default
 
 settings = get_settings()
 
@@ -11,31 +30,398 @@ settings = get_settings()
 # =====================================================
 # PostgreSQL Wrapper (for direct DB connection)
 # =====================================================
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that tracks its prepared statements."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.autocommit = True
+        # json/jsonb typecasters are registered globally by psycopg2.
+        # Prepared statements are per session, so track them per connection
+        self.prepared: set[str] = set()
+        self.created_at = self.last_used = time.monotonic()
+
+
 class PostgresClient:
     """
     Wrapper around psycopg2 that mimics Supabase client API.
     Allows using the same code for both Supabase and direct PostgreSQL.
     """
     
-    def __init__(self, connection_string: str):
-        import psycopg2
-        import psycopg2.extras
+    def __init__(
+        self,
+        connection_string: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        recycle_seconds: int = 1800,
+        pre_ping_idle_seconds: int = 300,
+        timeout_seconds: float = 30.0,
+    ):
         self.connection_string = connection_string
-        self._conn = None
-    
-    def _get_connection(self):
-        import psycopg2
-        import psycopg2.extras
-        if self._conn is None or self._conn.closed:
-            self._conn = psycopg2.connect(self.connection_string)
-            self._conn.autocommit = True
-            # Register JSON adapters
-            psycopg2.extras.register_default_json(self._conn)
-            psycopg2.extras.register_default_jsonb(self._conn)
-        return self._conn
+        self.recycle_seconds = recycle_seconds
+        self.pre_ping_idle_seconds = pre_ping_idle_seconds
+        self.timeout_seconds = timeout_seconds
+        # ThreadedConnectionPool raises PoolError at once when it is empty;
+        # callers (often more to_thread workers than connections) wait here
+        # for a free slot instead
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.min_size = min_size
+        self.max_size = max_size
+        # Opened on first use, per process: clients are created at import time
+        # (module-level services), and a pool opened in a preloading master
+        # would hand its sockets to every forked worker
+        self._pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+        self._pool_pid: Optional[int] = None
+        self._pool_lock = threading.Lock()
+    
+    def _get_pool(self) -> psycopg2.pool.ThreadedConnectionPool:
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._pool_lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = psycopg2.pool.ThreadedConnectionPool(
+                        self.min_size, self.max_size, self.connection_string,
+                        connection_factory=PooledConnection,
+                    )
+                    self._pool_pid = os.getpid()
+        return self._pool
+    
+    def _is_usable(self, conn: PooledConnection) -> bool:
+        """
+        Drop connections older than recycle_seconds, and ping ones that sat
+        idle long enough for the server or a pooler to have closed them.
+        """
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if now - conn.created_at > self.recycle_seconds:
+            return False
+        if now - conn.last_used > self.pre_ping_idle_seconds:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            except psycopg2.Error:
+                return False
+        return True
+    
+    def _checkout(self) -> PooledConnection:
+        pool = self._get_pool()
+        conn = pool.getconn()
+        while not self._is_usable(conn):
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+        return conn
+    
+    @contextmanager
+    def _conn(self):
+        """
+        Borrow a healthy pooled connection, waiting up to timeout_seconds when
+        all are in use; broken connections are discarded.
+        """
+        if not self._slots.acquire(timeout=self.timeout_seconds):
+            raise psycopg2.pool.PoolError(
+                f"no database connection free after {self.timeout_seconds}s"
+            )
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+            finally:
+                conn.last_used = time.monotonic()
+                self._get_pool().putconn(conn, close=bool(conn.closed))
+        finally:
+            self._slots.release()
     
     def table(self, table_name: str) -> 'PostgresTableQuery':
         return PostgresTableQuery(self, table_name)
+    
+    def rpc(self, fn: str, params: Optional[dict] = None) -> 'PostgresTableQuery':
+        """Call a SQL function with named arguments, like PostgREST /rpc/fn."""
+        params = params or {}
+        args = ", ".join(f"{_ident(name)} => %s" for name in params)
+        return PostgresTableQuery(self, fn).raw_sql(
+            f"SELECT * FROM {_ident(fn)}({args})",
+            [_process_value(v) for v in params.values()],
+        )
+
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# PostgREST resource embedding: "alias:child_table(col, ...)"
+_EMBED_RE = re.compile(r"(?:(\w+):)?(\w+)\(([\w\s,*]*)\)")
+
+
+def _ident(name: str) -> str:
+    """
+    Validate, lowercase and double-quote an identifier (same output as
+    psycopg2.sql.Identifier for these names), so equivalent queries always
+    produce byte-identical SQL and share prepared statements/plans.
+    """
+    if not _IDENTIFIER_RE.match(name):
+        raise ValueError(f"Invalid SQL identifier: {name!r}")
+    return f'"{name.lower()}"'
+
+
+def _columns_sql(cols: str) -> list[str]:
+    return [c if c == "*" else _ident(c) for c in (c.strip() for c in cols.split(",")) if c]
+
+
+# PostgREST operator -> SQL operator
+_FILTER_OPERATORS = {
+    "eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=",
+    "like": "LIKE", "ilike": "ILIKE", "cs": "@>", "in": "= ANY",
+}
+# PostgREST full-text operators -> tsquery constructor
+_TEXT_SEARCH_FUNCS = {
+    "fts": "to_tsquery",
+    "plfts": "plainto_tsquery",
+    "phfts": "phraseto_tsquery",
+    "wfts": "websearch_to_tsquery",
+}
+
+
+def _condition_sql(col: str, op: str) -> str:
+    if col == "__or__":
+        # op is an already-compiled or_() template (see _logic_tree_sql)
+        return f"({op})"
+    func, _, config = op.partition(":")
+    if func in _TEXT_SEARCH_FUNCS:
+        _ident(config)
+        return f"{_ident(col)} @@ {_TEXT_SEARCH_FUNCS[func]}('{config.lower()}', %s)"
+    if op == "= ANY":
+        return f"{_ident(col)} = ANY(%s)"
+    return f"{_ident(col)} {op} %s"
+
+
+def _split_top_level(conditions: str) -> list[str]:
+    """Split a PostgREST logic tree on commas outside parentheses and quotes."""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(conditions):
+        if ch == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(conditions[start:i])
+            start = i + 1
+    parts.append(conditions[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _array_literal(values) -> str:
+    """
+    in_() values as a '{...}' array literal. Bound as a plain string it is
+    untyped, so Postgres gives it the column's array type (uuid[], int[]);
+    a Python list is sent as ARRAY['...'], a text[] that won't cast to uuid[].
+    """
+    items = []
+    for v in values:
+        if v is None:
+            items.append("NULL")
+        else:
+            items.append('"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"')
+    return "{" + ",".join(items) + "}"
+
+
+def _logic_tree_sql(conditions: str, joiner: str = " OR ") -> tuple[str, list]:
+    """
+    Compile a PostgREST or_() string such as
+    "name_vi.ilike.*a*,and(created_at.eq.X,id.lt.Y)" into a SQL template
+    plus params. Only validated identifiers reach the SQL text.
+    """
+    clauses, params = [], []
+    for part in _split_top_level(conditions):
+        group, _, rest = part.partition("(")
+        if group in ("and", "or") and part.endswith(")"):
+            clause, values = _logic_tree_sql(rest[:-1], f" {group.upper()} ")
+            clauses.append(f"({clause})")
+            params += values
+            continue
+        col, op, value = part.split(".", 2)
+        if len(value) > 1 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        if op == "is":
+            if value.lower() not in ("null", "true", "false"):
+                raise ValueError(f"Invalid is. value: {value!r}")
+            clauses.append(f"{_ident(col)} IS {value.upper()}")
+            continue
+        if op == "in":
+            value = _array_literal(v.strip('"') for v in _split_top_level(value.strip("()")))
+        elif op in ("like", "ilike"):
+            value = value.replace("*", "%")
+        clauses.append(_condition_sql(col, _FILTER_OPERATORS[op]))
+        params.append(value)
+    return joiner.join(clauses), params
+
+
+def _foreign_key_for(table: str) -> str:
+    """orders -> order_id, categories -> category_id (PostgREST naming)."""
+    if table.endswith("ies"):
+        return table[:-3] + "y_id"
+    return table.rstrip("s") + "_id"
+
+
+def _select_list_sql(table: str, select_cols: str) -> str:
+    """Translate a PostgREST select list, expanding embeds to jsonb_agg subqueries."""
+    embeds = []
+
+    def embed(match: re.Match) -> str:
+        alias, child, cols = match.group(1), match.group(2), match.group(3)
+        child_sql = _ident(child)
+        embeds.append(
+            f"(SELECT COALESCE(jsonb_agg(e), '[]'::jsonb) FROM "
+            f"(SELECT {', '.join(_columns_sql(cols))} FROM {child_sql} "
+            f"WHERE {child_sql}.{_ident(_foreign_key_for(table))} = {_ident(table)}.\"id\") e)"
+            f" AS {_ident(alias or child)}"
+        )
+        return ""
+
+    columns = _columns_sql(_EMBED_RE.sub(embed, select_cols))
+    return ", ".join(columns + embeds)
+
+
+@lru_cache(maxsize=512)
+def _compile_sql(
+    table: str,
+    select_cols: str,
+    filter_shape: tuple,
+    order: tuple,
+    pagination: Optional[str],
+    for_count: bool,
+) -> str:
+    """
+    Compile the SELECT template for a query shape.
+    Only identifiers end up in the SQL text; values are bound as %s params.
+    """
+    table_sql = _ident(table)
+    if for_count:
+        parts = ["SELECT COUNT(*) FROM ", table_sql]
+    else:
+        parts = ["SELECT ", _select_list_sql(table, select_cols), " FROM ", table_sql]
+    
+    # WHERE
+    if filter_shape:
+        where_parts = [_condition_sql(col, op) for col, op in filter_shape]
+        parts += [" WHERE ", " AND ".join(where_parts)]
+    
+    # ORDER
+    if order and not for_count:
+        parts += [" ORDER BY ", ", ".join(
+            _ident(col) + (" DESC" if desc else " ASC") for col, desc in order
+        )]
+    
+    # LIMIT / OFFSET (range)
+    if pagination == "range":
+        parts.append(" LIMIT %s OFFSET %s")
+    elif pagination == "limit":
+        parts.append(" LIMIT %s")
+    
+    return "".join(parts)
+
+
+_ESTIMATED_COUNT_SQL = (
+    "SELECT reltuples::bigint AS count FROM pg_class "
+    "WHERE oid = to_regclass(%s)"
+)
+
+_PLACEHOLDER_RE = re.compile(r"%s")
+
+
+@lru_cache(maxsize=512)
+def _prepare_sql(query: str) -> tuple[str, str]:
+    """Return (statement name, query with $n placeholders) for PREPARE."""
+    name = "q_" + hashlib.sha1(query.encode()).hexdigest()
+    counter = iter(range(1, query.count("%s") + 1))
+    return name, _PLACEHOLDER_RE.sub(lambda _: f"${next(counter)}", query)
+
+
+def _execute_prepared(cursor, query: str, params: list) -> None:
+    """Run a compiled SELECT as a named prepared statement on this connection."""
+    name, positional = _prepare_sql(query)
+    prepared = cursor.connection.prepared
+    if name not in prepared:
+        cursor.execute(f"PREPARE {name} AS {positional}")
+        prepared.add(name)
+    if params:
+        cursor.execute(f"EXECUTE {name}({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(f"EXECUTE {name}")
+
+
+def _json_dumps(value: Any) -> str:
+    # NUMERIC columns read through this client come back as Decimal, which
+    # json.dumps (psycopg2's default) rejects
+    return orjson.dumps(value, default=json_default).decode()
+
+
+def _process_value(val):
+    if isinstance(val, (dict, list)):
+        return psycopg2.extras.Json(val, dumps=_json_dumps)
+    return val
+
+
+def _where_sql(filter_shape: tuple):
+    if not filter_shape:
+        return sql.SQL("")
+    return sql.SQL(" WHERE ") + sql.SQL(" AND ").join(
+        sql.SQL(_condition_sql(col, op)) for col, op in filter_shape
+    )
+
+
+@lru_cache(maxsize=256)
+def _insert_sql(table: str, columns: tuple):
+    return sql.SQL("INSERT INTO {tbl} ({cols}) VALUES ({vals}) RETURNING *").format(
+        tbl=sql.Identifier(table),
+        cols=sql.SQL(", ").join(map(sql.Identifier, columns)),
+        vals=sql.SQL(", ").join(sql.Placeholder() * len(columns)),
+    )
+
+
+@lru_cache(maxsize=256)
+def _insert_many_sql(table: str, columns: tuple, conflict: Optional[tuple] = None):
+    """
+    INSERT template for psycopg2.extras.execute_values (single VALUES %s).
+    conflict=(conflict_columns, ignore_duplicates) turns it into an upsert.
+    """
+    on_conflict = sql.SQL("")
+    if conflict:
+        target, ignore_duplicates = conflict
+        on_conflict = sql.SQL(" ON CONFLICT ({}) ").format(
+            sql.SQL(", ").join(map(sql.Identifier, target))
+        )
+        if ignore_duplicates:
+            on_conflict += sql.SQL("DO NOTHING")
+        else:
+            on_conflict += sql.SQL("DO UPDATE SET ") + sql.SQL(", ").join(
+                sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(col))
+                for col in columns if col not in target
+            )
+    return sql.SQL("INSERT INTO {tbl} ({cols}) VALUES %s{conflict} RETURNING *").format(
+        tbl=sql.Identifier(table),
+        cols=sql.SQL(", ").join(map(sql.Identifier, columns)),
+        conflict=on_conflict,
+    )
+
+
+@lru_cache(maxsize=256)
+def _update_sql(table: str, columns: tuple, filter_shape: tuple):
+    return sql.SQL("UPDATE {tbl} SET {sets}{where} RETURNING *").format(
+        tbl=sql.Identifier(table),
+        sets=sql.SQL(", ").join(
+            sql.SQL("{} = %s").format(sql.Identifier(col)) for col in columns
+        ),
+        where=_where_sql(filter_shape),
+    )
+
+
+@lru_cache(maxsize=256)
+def _delete_sql(table: str, filter_shape: tuple):
+    return sql.SQL("DELETE FROM {tbl}{where} RETURNING *").format(
+        tbl=sql.Identifier(table),
+        where=_where_sql(filter_shape),
+    )
 
 
 class PostgresTableQuery:
@@ -47,12 +433,13 @@ class PostgresTableQuery:
         self._select_cols = "*"
         self._count_mode = None
         self._filters = []
-        self._order_col = None
-        self._order_desc = False
+        self._orders = []
         self._limit_val = None
         self._offset_val = None
         self._range_start = None
         self._range_end = None
+        # Statement runner; insert()/update()/delete() rebind it
+        self._execute = self._execute_select
     
     def select(self, columns: str = "*", count: str = None) -> 'PostgresTableQuery':
         self._select_cols = columns
@@ -87,18 +474,33 @@ class PostgresTableQuery:
         self._filters.append((column, "ILIKE", pattern))
         return self
     
+    def in_(self, column: str, values: list) -> 'PostgresTableQuery':
+        self._filters.append((column, "= ANY", list(values)))
+        return self
+    
     def contains(self, column: str, value: list) -> 'PostgresTableQuery':
         self._filters.append((column, "@>", value))
         return self
     
+    def filter(self, column: str, operator: str, value: Any) -> 'PostgresTableQuery':
+        """Generic PostgREST filter, e.g. filter("search_tsv", "wfts(simple)", q)."""
+        op, _, config = operator.partition("(")
+        if op in _TEXT_SEARCH_FUNCS:
+            config = config.rstrip(")") or "simple"
+            self._filters.append((column, f"{op}:{config}", value))
+        else:
+            self._filters.append((column, _FILTER_OPERATORS[op], value))
+        return self
+    
     def or_(self, conditions: str) -> 'PostgresTableQuery':
-        # Simplified or_ - parse conditions like "name_vi.ilike.%q%,name_en.ilike.%q%"
-        self._filters.append(("__or__", conditions, None))
+        """PostgREST logic tree, e.g. "name_vi.ilike.%q%,and(a.eq.1,b.lt.2)"."""
+        template, values = _logic_tree_sql(conditions)
+        self._filters.append(("__or__", template, values))
         return self
     
     def order(self, column: str, desc: bool = False) -> 'PostgresTableQuery':
-        self._order_col = column
-        self._order_desc = desc
+        # Repeated calls add tie-breakers, as in PostgREST
+        self._orders.append((column, desc))
         return self
     
     def limit(self, count: int) -> 'PostgresTableQuery':
@@ -111,130 +513,166 @@ class PostgresTableQuery:
         return self
     
     def _build_query(self, for_count: bool = False) -> tuple[str, list]:
-        import psycopg2.sql as sql
-        
+        filter_shape = tuple((col, op) for col, op, _ in self._filters)
+        order = tuple(self._orders)
         params = []
+        for col, op, val in self._filters:
+            if col == "__or__":
+                params += val
+            elif op == "= ANY":
+                params.append(_array_literal(val))
+            else:
+                params.append(val)
         
-        # SELECT
-        if for_count:
-            query = f"SELECT COUNT(*) FROM {self.table_name}"
-        else:
-            query = f"SELECT {self._select_cols} FROM {self.table_name}"
-        
-        # WHERE
-        if self._filters:
-            where_parts = []
-            for f in self._filters:
-                col, op, val = f
-                if col == "__or__":
-                    # Parse or conditions (simplified)
-                    where_parts.append(f"({op})")
-                elif op == "@>":
-                    where_parts.append(f"{col} @> %s")
-                    params.append(val)
-                else:
-                    where_parts.append(f"{col} {op} %s")
-                    params.append(val)
-            query += " WHERE " + " AND ".join(where_parts)
-        
-        # ORDER
-        if self._order_col and not for_count:
-            direction = "DESC" if self._order_desc else "ASC"
-            query += f" ORDER BY {self._order_col} {direction}"
-        
-        # LIMIT / OFFSET (range)
-        if self._range_start is not None and not for_count:
-            query += f" LIMIT {self._range_end - self._range_start + 1} OFFSET {self._range_start}"
-        elif self._limit_val and not for_count:
-            query += f" LIMIT {self._limit_val}"
+        # LIMIT / OFFSET (range) are bound as params so the template is reusable
+        pagination = None
+        if not for_count:
+            if self._range_start is not None:
+                pagination = "range"
+                params += [self._range_end - self._range_start + 1, self._range_start]
+            elif self._limit_val:
+                pagination = "limit"
+                params.append(self._limit_val)
         
+        query = _compile_sql(
+            self.table_name, self._select_cols, filter_shape, order, pagination, for_count
+        )
         return query, params
     
     def execute(self) -> 'PostgresResult':
-        import psycopg2.extras
-        import json
-        conn = self.client._get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        # Helper to process values
-        def process_value(val):
-            if isinstance(val, (dict, list)):
-                return json.dumps(val)
-            return val
-
-        # Handle mutations first
-        if hasattr(self, '_insert_data') and self._insert_data:
-            columns = list(self._insert_data.keys())
-            values = [process_value(v) for v in self._insert_data.values()]
-            placeholders = ["%s"] * len(values)
-            
-            query = f"INSERT INTO {self.table_name} ({', '.join(columns)}) VALUES ({', '.join(placeholders)}) RETURNING *"
-            cursor.execute(query, values)
-            data = [dict(row) for row in cursor.fetchall()]
-            return PostgresResult(data, len(data))
-            
-        if hasattr(self, '_update_data') and self._update_data:
-            set_clauses = []
-            values = []
-            for k, v in self._update_data.items():
-                set_clauses.append(f"{k} = %s")
-                values.append(process_value(v))
-            
-            where_clause = ""
-            if self._filters:
-                where_parts = []
-                for f in self._filters:
-                    col, op, val = f
-                    where_parts.append(f"{col} {op} %s")
-                    values.append(process_value(val))
-                where_clause = " WHERE " + " AND ".join(where_parts)
-            
-            query = f"UPDATE {self.table_name} SET {', '.join(set_clauses)}{where_clause} RETURNING *"
-            cursor.execute(query, values)
-            data = [dict(row) for row in cursor.fetchall()]
-            return PostgresResult(data, len(data))
-            
-        if hasattr(self, '_delete') and self._delete:
-            values = []
-            where_clause = ""
-            if self._filters:
-                where_parts = []
-                for f in self._filters:
-                    col, op, val = f
-                    where_parts.append(f"{col} {op} %s")
-                    values.append(process_value(val))
-                where_clause = " WHERE " + " AND ".join(where_parts)
-            
-            query = f"DELETE FROM {self.table_name}{where_clause} RETURNING *"
-            cursor.execute(query, values)
-            data = [dict(row) for row in cursor.fetchall()]
-            return PostgresResult(data, len(data))
-
-        # Get data (SELECT)
+        with self.client._conn() as conn, \
+                conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            return self._execute(cursor)
+
+    def _filter_params(self) -> tuple[tuple, list]:
+        shape = tuple((col, op) for col, op, _ in self._filters)
+        params = []
+        for col, op, val in self._filters:
+            if col == "__or__":
+                params += val
+            elif op == "= ANY":
+                # in_() lists bind as array literals, not JSON
+                params.append(_array_literal(val))
+            else:
+                params.append(_process_value(val))
+        return shape, params
+
+    def _execute_insert(self, data: dict, cursor) -> 'PostgresResult':
+        if isinstance(data, list):
+            return self._execute_insert_many(data, cursor)
+        values = [_process_value(v) for v in data.values()]
+        cursor.execute(_insert_sql(self.table_name, tuple(data.keys())), values)
+        rows = cursor.fetchall()
+        return PostgresResult(rows, len(rows))
+
+    def _execute_insert_many(
+        self, rows: list[dict], cursor, conflict: Optional[tuple] = None
+    ) -> 'PostgresResult':
+        if not rows:
+            return PostgresResult([], 0)
+        columns = tuple(rows[0].keys())
+        values = [tuple(_process_value(row.get(col)) for col in columns) for row in rows]
+        query = _insert_many_sql(self.table_name, columns, conflict).as_string(cursor)
+        data = psycopg2.extras.execute_values(cursor, query, values, fetch=True)
+        return PostgresResult(data, len(data))
+
+    def _execute_update(self, data: dict, cursor) -> 'PostgresResult':
+        filter_shape, filter_values = self._filter_params()
+        values = [_process_value(v) for v in data.values()]
+        query = _update_sql(self.table_name, tuple(data.keys()), filter_shape)
+        cursor.execute(query, values + filter_values)
+        rows = cursor.fetchall()
+        return PostgresResult(rows, len(rows))
+
+    def _execute_delete(self, cursor) -> 'PostgresResult':
+        filter_shape, filter_values = self._filter_params()
+        cursor.execute(_delete_sql(self.table_name, filter_shape), filter_values)
+        rows = cursor.fetchall()
+        return PostgresResult(rows, len(rows))
+
+    def _execute_select(self, cursor) -> 'PostgresResult':
         query, params = self._build_query()
-        cursor.execute(query, params)
-        data = [dict(row) for row in cursor.fetchall()]
+        _execute_prepared(cursor, query, params)
+        data = cursor.fetchall()
         
         # Get count if requested
         count = None
-        if self._count_mode == "exact":
+        if self._count_mode == "estimated" and not self._filters:
+            # Planner estimate: O(1) instead of scanning the table.
+            # reltuples is -1 until the table has been vacuumed/analyzed.
+            _execute_prepared(cursor, _ESTIMATED_COUNT_SQL, [self.table_name])
+            row = cursor.fetchone()
+            if row and row['count'] >= 0:
+                count = row['count']
+        if self._count_mode in ("exact", "estimated") and count is None:
             count_query, count_params = self._build_query(for_count=True)
-            cursor.execute(count_query, count_params)
+            _execute_prepared(cursor, count_query, count_params)
             count = cursor.fetchone()['count']
         
-        cursor.close()
         return PostgresResult(data, count)
 
-    def insert(self, data: dict) -> 'PostgresTableQuery':
-        self._insert_data = data
+    def stream(self, itersize: int = 1000) -> Iterator[dict]:
+        """
+        Iterate over SELECT results with a server-side (named) cursor so large
+        exports are not materialized in memory. Pagination is ignored.
+        """
+        query, params = self._build_query()
+        with self.client._conn() as conn:
+            # Named cursors only live inside a transaction
+            conn.autocommit = False
+            try:
+                with conn.cursor(
+                    name=f"c_{uuid4().hex}", cursor_factory=psycopg2.extras.RealDictCursor
+                ) as cursor:
+                    cursor.itersize = itersize
+                    cursor.execute(query, params)
+                    yield from cursor
+                conn.commit()
+            finally:
+                if not conn.closed:
+                    conn.rollback()
+                    conn.autocommit = True
+
+    def raw_sql(self, query: str, params: Optional[list] = None) -> 'PostgresTableQuery':
+        """
+        Escape hatch for statements the builder can't express (CTEs etc).
+        Only for SQL written in code; values must go through params.
+        """
+        self._execute = partial(self._execute_raw, query, params or [])
+        return self
+
+    def _execute_raw(self, query: str, params: list, cursor) -> 'PostgresResult':
+        cursor.execute(query, params)
+        rows = cursor.fetchall() if cursor.description else []
+        return PostgresResult(rows, len(rows))
+
+    def insert(self, data: dict | list[dict]) -> 'PostgresTableQuery':
+        self._execute = partial(self._execute_insert, data)
+        return self
+    
+    def upsert(
+        self,
+        data: dict | list[dict],
+        on_conflict: str = "id",
+        ignore_duplicates: bool = False,
+    ) -> 'PostgresTableQuery':
+        """
+        INSERT ... ON CONFLICT. With ignore_duplicates only newly inserted
+        rows are returned (DO NOTHING), matching PostgREST.
+        """
+        rows = data if isinstance(data, list) else [data]
+        target = tuple(c.strip() for c in on_conflict.split(","))
+        self._execute = partial(
+            self._execute_insert_many, rows, conflict=(target, ignore_duplicates)
+        )
         return self
     
     def update(self, data: dict) -> 'PostgresTableQuery':
-        self._update_data = data
+        self._execute = partial(self._execute_update, data)
         return self
     
     def delete(self) -> 'PostgresTableQuery':
-        self._delete = True
+        self._execute = self._execute_delete
         return self
 
 
@@ -246,48 +684,156 @@ class PostgresResult:
         self.count = count
 
 
+def iter_rows(query, chunk_size: int = 1000) -> Iterator[dict]:
+    """
+    Stream all rows of a select query.
+    Uses a server-side cursor in PostgreSQL mode; pages with range() for
+    Supabase, so the query should be ordered for stable paging.
+    """
+    if isinstance(query, PostgresTableQuery):
+        yield from query.stream(itersize=chunk_size)
+        return
+    offset = 0
+    while True:
+        rows = query.range(offset, offset + chunk_size - 1).execute().data
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        offset += chunk_size
+
+
+# Rows per multi-row write; keeps PostgREST request bodies and statement
+# runtimes well under their limits
+WRITE_CHUNK_SIZE = 500
+
+
+def chunked(rows: list, size: int = WRITE_CHUNK_SIZE) -> Iterator[list]:
+    """Split rows into consecutive lists of at most size items."""
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
 # =====================================================
 # Database Client Factory
 # =====================================================
+@lru_cache(maxsize=None)
 def _create_postgres_client():
-    """Create direct PostgreSQL client."""
-    return PostgresClient(settings.database_url)
+    """Create direct PostgreSQL client (one pool per process)."""
+    return PostgresClient(
+        settings.database_url,
+        min_size=settings.pool_min_size,
+        max_size=settings.pool_max_size,
+        recycle_seconds=settings.pool_recycle_seconds,
+        timeout_seconds=settings.pool_timeout_seconds,
+    )
+
+
+@lru_cache(maxsize=None)
+def _supabase_http_client() -> httpx.Client:
+    """
+    One keep-alive HTTP pool per process, shared by the public and admin
+    Supabase clients, with explicit limits instead of httpx's defaults.
+    """
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=settings.pool_max_size,
+            max_keepalive_connections=settings.pool_keepalive_size,
+            keepalive_expiry=30.0,
+        ),
+        timeout=httpx.Timeout(settings.pool_timeout_seconds),
+    )
 
 
 def _create_supabase_client(admin: bool = False):
     """Create Supabase client."""
-    from supabase import create_client, Client
-    if admin:
-        return create_client(settings.supabase_url, settings.supabase_service_role_key)
-    return create_client(settings.supabase_url, settings.supabase_anon_key)
+    from supabase import create_client, ClientOptions
+    key = settings.supabase_service_role_key if admin else settings.supabase_anon_key
+    options = ClientOptions(
+        httpx_client=_supabase_http_client(),
+        postgrest_client_timeout=settings.pool_timeout_seconds,
+    )
+    return create_client(settings.supabase_url, key, options=options)
 
 
 # =====================================================
 # Public API - Same interface for both modes
 # =====================================================
-if settings.use_postgres:
-    # Direct PostgreSQL mode
-    print("🐘 Using direct PostgreSQL connection")
-    _db_client = _create_postgres_client()
-    supabase = _db_client
-    supabase_admin = _db_client
-else:
-    # Supabase mode
-    print("⚡ Using Supabase client")
-    supabase = _create_supabase_client(admin=False)
-    supabase_admin = _create_supabase_client(admin=True)
+# Order row with its line items embedded, fetched in one round-trip
+ORDER_WITH_ITEMS = "*, items:order_items(*)"
+
+
+@lru_cache(maxsize=None)
+def _client(admin: bool = False):
+    """
+    Create the database client on first use and reuse it for the process.
+    In PostgreSQL mode the public and admin clients share one pool.
+    """
+    if settings.use_postgres:
+        return _create_postgres_client()
+    return _create_supabase_client(admin=admin)
 
 
 def get_supabase():
     """Dependency for public database client."""
-    return supabase
+    return _client(False)
 
 
 def get_supabase_admin():
     """Dependency for admin database client (bypasses RLS in Supabase mode)."""
-    return supabase_admin
+    return _client(True)
 
 
 def get_db_client():
     """Get database client - alias for compatibility with AI services."""
-    return supabase
+    return _client(False)
+
+
+def warm_clients() -> None:
+    """
+    Build this worker's clients (and their connection pools) at startup, so
+    the first requests don't pay for client construction and TLS setup.
+    """
+    _client(False)
+    _client(True)
+
+
+# =====================================================
+# asyncpg pool (DATABASE_URL mode) for hot async read paths
+# =====================================================
+async def _init_pg_connection(conn) -> None:
+    for typename in ("json", "jsonb"):
+        await conn.set_type_codec(
+            typename,
+            schema="pg_catalog",
+            encoder=lambda v: orjson.dumps(v).decode(),
+            decoder=orjson.loads,
+        )
+
+
+async def create_pg_pool():
+    """Create the asyncpg pool at startup; None in Supabase mode."""
+    if not settings.use_postgres:
+        return None
+    import asyncpg
+    return await asyncpg.create_pool(
+        settings.database_url,
+        min_size=settings.pool_min_size,
+        max_size=settings.pool_max_size,
+        max_inactive_connection_lifetime=settings.pool_recycle_seconds,
+        statement_cache_size=settings.pool_statement_cache_size,
+        init=_init_pg_connection,
+    )
+
+
+def get_pg_pool(request: Request):
+    """Dependency for the asyncpg pool (None when not in DATABASE_URL mode)."""
+    return getattr(request.app.state, "pg", None)
+
+
+@lru_cache(maxsize=None)
+def get_redis():
+    """Shared async Redis client, or None when REDIS_URL is not configured."""
+    if not settings.redis_url:
+        return None
+    import redis.asyncio as redis
+    return redis.from_url(settings.redis_url)
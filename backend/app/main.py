@@ -2,21 +2,45 @@
 YenFlowers API - Main Application Entry Point
 """
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.config import get_settings
+from app.database import create_pg_pool, warm_clients
 from app.routers import admin, public, orders, upload, auth, ai, occasions
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.use_postgres:
+        print("🐘 Using direct PostgreSQL connection")
+    else:
+        print("⚡ Using Supabase client")
+    warm_clients()
+    app.state.pg = await create_pg_pool()
+    ai.interaction_tracker.start()
+    public.blog_views.start()
+    yield
+    # Write out queued /ai/track events and blog views before the pools go away
+    await ai.interaction_tracker.stop()
+    await public.blog_views.stop()
+    if app.state.pg is not None:
+        await app.state.pg.close()
+
+
 app = FastAPI(
     title=settings.app_name,
     description="API for YenFlowers E-commerce Platform with AI Features",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS Middleware
@@ -59,4 +83,16 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    if settings.debug:
+        # Auto-reload supports a single process only (default asyncio loop)
+        uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    else:
+        # uvloop + httptools ship with uvicorn[standard]
+        uvicorn.run(
+            "app.main:app",
+            host="0.0.0.0",
+            port=8000,
+            loop="uvloop",
+            http="httptools",
+            workers=os.cpu_count() or 1,
+        )
@@ -2,22 +2,38 @@
 Admin API routes for managing products, categories, orders, blog, and settings.
 All routes require admin authentication.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
-from uuid import UUID
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Request, Response
+from fastapi.responses import StreamingResponse
+from uuid import UUID, uuid4
+import asyncio
+import json
+import re
+import traceback
+import unicodedata
+from datetime import datetime, timezone
+from functools import partial
+from typing import Literal, Optional
 from supabase import Client
 
-from app.database import get_supabase_admin
+from app.database import (
+    ORDER_WITH_ITEMS, WRITE_CHUNK_SIZE, PostgresClient, chunked, get_pg_pool, get_supabase_admin,
+    iter_rows,
+)
 from app.schemas.schemas import (
     CategoryCreate, CategoryUpdate, CategoryResponse,
     ProductCreate, ProductUpdate, ProductResponse,
     OrderResponse, OrderStatusUpdate,
     BlogPostCreate, BlogPostUpdate, BlogPostResponse,
     SocialFeedResponse, ImportAsProductRequest, BulkImportAsProductRequest, SocialSyncRequest,
-    PaginatedResponse
+    cursor_page, paginated
 )
+from app.services import catalog_cache, settings_cache
 from app.services.facebook_sync import get_fb_service
+from app.workers import fb_sync_worker
 from app.dependencies import get_current_admin
+from app.core.etag import not_modified
+from app.core.pagination import next_cursor, seek
+from app.core.responses import RowsJSONResponse
 
 router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(get_current_admin)])
 
@@ -27,16 +43,20 @@ router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(get_cu
 # =====================================================
 @router.get("/categories", response_model=list[CategoryResponse])
 async def list_categories(
+    request: Request,
+    response: Response,
     include_inactive: bool = False,
     db: Client = Depends(get_supabase_admin)
 ):
     """List all categories (admin view includes inactive)."""
-    query = db.table("categories").select("*").order("sort_order")
-    if not include_inactive:
-        query = query.eq("is_active", True)
+    def load():
+        query = db.table("categories").select("*").order("sort_order")
+        if not include_inactive:
+            query = query.eq("is_active", True)
+        return query.execute().data
     
-    result = query.execute()
-    return result.data
+    categories = await catalog_cache.get_categories(("admin", include_inactive), load)
+    return not_modified(request, response, categories) or categories
 
 
 @router.post("/categories", response_model=CategoryResponse)
@@ -45,22 +65,25 @@ async def create_category(
     db: Client = Depends(get_supabase_admin)
 ):
     """Create a new category."""
-    result = db.table("categories").insert(category.model_dump()).execute()
+    result = db.table("categories").insert(category.model_dump(mode="json")).execute()
     if not result.data:
         raise HTTPException(status_code=400, detail="Failed to create category")
+    await catalog_cache.invalidate_categories()
     return result.data[0]
 
 
 @router.get("/categories/{category_id}", response_model=CategoryResponse)
 async def get_category(
     category_id: UUID,
+    request: Request,
+    response: Response,
     db: Client = Depends(get_supabase_admin)
 ):
     """Get a single category by ID."""
     result = db.table("categories").select("*").eq("id", str(category_id)).execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="Category not found")
-    return result.data[0]
+    return not_modified(request, response, result.data) or result.data[0]
 
 
 @router.patch("/categories/{category_id}", response_model=CategoryResponse)
@@ -70,13 +93,14 @@ async def update_category(
     db: Client = Depends(get_supabase_admin)
 ):
     """Update a category."""
-    update_data = category.model_dump(exclude_unset=True)
+    update_data = category.model_dump(mode="json", exclude_unset=True)
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
     
     result = db.table("categories").update(update_data).eq("id", str(category_id)).execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="Category not found")
+    await catalog_cache.invalidate_categories()
     return result.data[0]
 
 
@@ -87,13 +111,83 @@ async def delete_category(
 ):
     """Delete a category."""
     db.table("categories").delete().eq("id", str(category_id)).execute()
+    await catalog_cache.invalidate_categories()
     return {"message": "Category deleted"}
 
 
+# Runs of anything but [a-z0-9] collapse to one "-" in generated slugs
+_SLUG_RE = re.compile(r'[^a-z0-9]+')
+# After NFD, drop combining diacritics (U+0300-U+036F) and map đ/Đ, which
+# has no decomposition, in a single str.translate pass
+_SLUG_TRANS = str.maketrans(
+    {**{cp: None for cp in range(0x300, 0x370)}, ord('đ'): 'd', ord('Đ'): 'D'}
+)
+
+
+def _slugify(name: str) -> str:
+    """"Hoa Hồng Đỏ" -> "hoa-hong-do"."""
+    ascii_name = unicodedata.normalize('NFD', name).translate(_SLUG_TRANS)
+    return _SLUG_RE.sub('-', ascii_name.lower()).strip('-')
+
+
+# count=none skips the COUNT entirely; the response then carries has_more
+CountMode = Literal["exact", "estimated", "none"]
+
+
+# List views only get the columns the admin tables and edit dialogs use
+# (products carry a 1536-dim embedding and a tsvector that are never shown).
+# Detail endpoints still return full rows.
+PRODUCT_LIST_COLUMNS = (
+    "id,sku,slug,name_vi,name_en,price,sale_price,category_id,images,tags,"
+    "stock_quantity,is_featured,is_published,created_at,updated_at"
+)
+# content_vi stays: the blog editor and publish toggle resend it from the list row
+BLOG_LIST_COLUMNS = (
+    "id,slug,title_vi,title_en,excerpt_vi,content_vi,featured_image,author_id,tags,"
+    "is_published,published_at,view_count,created_at,updated_at"
+)
+
+
+def _select_for_list(
+    db: Client, table: str, count_mode: CountMode, cursor: Optional[str], columns: str = "*"
+):
+    count = None if cursor or count_mode == "none" else count_mode
+    return db.table(table).select(columns, count=count)
+
+
+def _list_page(
+    query, sort_column: str, page: int, page_size: int, cursor: Optional[str], count_mode: CountMode
+) -> dict:
+    """
+    Run a list query newest-first. With a cursor, seek past it (keyset, no
+    COUNT); otherwise fall back to page/offset. One look-ahead row tells
+    whether a next page exists.
+    """
+    query = seek(query, sort_column, cursor)
+    if cursor:
+        rows = query.limit(page_size + 1).execute().data
+        return cursor_page(rows[:page_size], page_size, next_cursor(rows, page_size, sort_column))
+    offset = (page - 1) * page_size
+    result = query.range(offset, offset + page_size).execute()
+    rows = result.data
+    if count_mode == "none":
+        return {
+            "items": rows[:page_size],
+            "page": page,
+            "page_size": page_size,
+            "has_more": len(rows) > page_size,
+            "next_cursor": next_cursor(rows, page_size, sort_column),
+        }
+    return paginated(
+        rows[:page_size], result.count or 0, page, page_size,
+        next_cursor(rows, page_size, sort_column),
+    )
+
+
 # =====================================================
 # PRODUCTS
 # =====================================================
-@router.get("/products", response_model=PaginatedResponse)
+@router.get("/products")
 async def list_products(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
@@ -101,33 +195,61 @@ async def list_products(
     is_published: Optional[bool] = None,
     is_featured: Optional[bool] = None,
     search: Optional[str] = None,
+    count_mode: CountMode = "estimated",
+    cursor: Optional[str] = None,
+    db: Client = Depends(get_supabase_admin)
+):
+    """
+    List products with filtering and pagination.
+    count_mode=estimated uses the planner's row estimate when unfiltered;
+    count_mode=none skips counting and returns has_more instead of totals.
+    Pass the returned next_cursor as cursor for keyset pagination (no total).
+    Pages are cached in Redis for 30s and retired on any product write.
+    """
+    def load() -> dict:
+        query = _select_for_list(db, "products", count_mode, cursor, PRODUCT_LIST_COLUMNS)
+        
+        if category_id:
+            query = query.eq("category_id", str(category_id))
+        if is_published is not None:
+            query = query.eq("is_published", is_published)
+        if is_featured is not None:
+            query = query.eq("is_featured", is_featured)
+        if search:
+            # GIN-indexed full-text match over name_vi/name_en/sku (migration 007)
+            query = query.filter("search_tsv", "wfts(simple)", search)
+        
+        return _list_page(query, "created_at", page, page_size, cursor, count_mode)
+    
+    params = {
+        "page": page, "page_size": page_size, "category_id": category_id,
+        "is_published": is_published, "is_featured": is_featured,
+        "search": search.strip().lower() if search else None,
+        "count_mode": count_mode, "cursor": cursor,
+    }
+    return RowsJSONResponse(await catalog_cache.get_product_list(params, load))
+
+
+@router.get("/products/export")
+async def export_products(
+    category_id: Optional[UUID] = None,
+    is_published: Optional[bool] = None,
     db: Client = Depends(get_supabase_admin)
 ):
-    """List products with filtering and pagination."""
-    query = db.table("products").select("*", count="exact")
+    """Export all products as newline-delimited JSON, streamed row by row."""
+    query = db.table("products").select("*")
     
     if category_id:
         query = query.eq("category_id", str(category_id))
     if is_published is not None:
         query = query.eq("is_published", is_published)
-    if is_featured is not None:
-        query = query.eq("is_featured", is_featured)
-    if search:
-        query = query.or_(f"name_vi.ilike.%{search}%,name_en.ilike.%{search}%,sku.ilike.%{search}%")
-    
-    # Pagination
-    offset = (page - 1) * page_size
-    query = query.order("created_at", desc=True).range(offset, offset + page_size - 1)
+    query = query.order("created_at", desc=True)
     
-    result = query.execute()
-    total = result.count or 0
-    
-    return PaginatedResponse(
-        items=result.data,
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=(total + page_size - 1) // page_size
+    lines = (json.dumps(row, default=str, ensure_ascii=False) + "\n" for row in iter_rows(query))
+    return StreamingResponse(
+        lines,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=products.ndjson"},
     )
 
 
@@ -137,26 +259,33 @@ async def create_product(
     db: Client = Depends(get_supabase_admin)
 ):
     """Create a new product."""
-    data = product.model_dump()
-    # Convert images list to JSON-serializable format
-    data["images"] = [img.model_dump() if hasattr(img, 'model_dump') else img for img in data.get("images", [])]
+    # mode="json": nested images become dicts and UUIDs strings in one pass
+    data = product.model_dump(mode="json")
     
     result = db.table("products").insert(data).execute()
     if not result.data:
         raise HTTPException(status_code=400, detail="Failed to create product")
+    await catalog_cache.invalidate_products()
     return result.data[0]
 
 
 @router.get("/products/{product_id}", response_model=ProductResponse)
 async def get_product(
     product_id: UUID,
-    db: Client = Depends(get_supabase_admin)
+    request: Request,
+    response: Response,
+    db: Client = Depends(get_supabase_admin),
+    pg = Depends(get_pg_pool)
 ):
     """Get a single product by ID."""
-    result = db.table("products").select("*").eq("id", str(product_id)).execute()
-    if not result.data:
+    if pg is not None:
+        row = await pg.fetchrow("SELECT * FROM products WHERE id = $1", product_id)
+        rows = [dict(row)] if row else []
+    else:
+        rows = db.table("products").select("*").eq("id", str(product_id)).execute().data
+    if not rows:
         raise HTTPException(status_code=404, detail="Product not found")
-    return result.data[0]
+    return not_modified(request, response, rows) or rows[0]
 
 
 @router.patch("/products/{product_id}", response_model=ProductResponse)
@@ -166,22 +295,16 @@ async def update_product(
     db: Client = Depends(get_supabase_admin)
 ):
     """Update a product."""
-    update_data = product.model_dump(exclude_unset=True)
+    # mode="json": nested images become dicts and UUIDs strings in one pass
+    update_data = product.model_dump(mode="json", exclude_unset=True)
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
     
-    # Handle images serialization
-    if "images" in update_data and update_data["images"]:
-        update_data["images"] = [img.model_dump() if hasattr(img, 'model_dump') else img for img in update_data["images"]]
-    
-    # Convert UUID to string for database
-    if "category_id" in update_data and update_data["category_id"]:
-        update_data["category_id"] = str(update_data["category_id"])
-    
     try:
         result = db.table("products").update(update_data).eq("id", str(product_id)).execute()
         if not result.data:
             raise HTTPException(status_code=404, detail="Product not found")
+        await catalog_cache.invalidate_products()
         return result.data[0]
     except Exception as e:
         error_msg = str(e)
@@ -197,41 +320,37 @@ async def delete_product(
 ):
     """Delete a product."""
     db.table("products").delete().eq("id", str(product_id)).execute()
+    await catalog_cache.invalidate_products()
     return {"message": "Product deleted"}
 
 
 # =====================================================
 # ORDERS
 # =====================================================
-@router.get("/orders", response_model=PaginatedResponse)
+@router.get("/orders")
 async def list_orders(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     order_status: Optional[str] = None,
     payment_status: Optional[str] = None,
+    count_mode: CountMode = "estimated",
+    cursor: Optional[str] = None,
     db: Client = Depends(get_supabase_admin)
 ):
-    """List orders with filtering and pagination."""
-    query = db.table("orders").select("*", count="exact")
+    """
+    List orders with filtering and pagination.
+    count_mode=estimated uses the planner's row estimate when unfiltered;
+    count_mode=none skips counting and returns has_more instead of totals.
+    Pass the returned next_cursor as cursor for keyset pagination (no total).
+    """
+    query = _select_for_list(db, "orders", count_mode, cursor)
     
     if order_status:
         query = query.eq("order_status", order_status)
     if payment_status:
         query = query.eq("payment_status", payment_status)
     
-    offset = (page - 1) * page_size
-    query = query.order("created_at", desc=True).range(offset, offset + page_size - 1)
-    
-    result = query.execute()
-    total = result.count or 0
-    
-    return PaginatedResponse(
-        items=result.data,
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=(total + page_size - 1) // page_size
-    )
+    return RowsJSONResponse(_list_page(query, "created_at", page, page_size, cursor, count_mode))
 
 
 @router.get("/orders/{order_id}", response_model=OrderResponse)
@@ -240,15 +359,11 @@ async def get_order(
     db: Client = Depends(get_supabase_admin)
 ):
     """Get order with items."""
-    order = db.table("orders").select("*").eq("id", str(order_id)).execute()
+    order = db.table("orders").select(ORDER_WITH_ITEMS).eq("id", str(order_id)).execute()
     if not order.data:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    items = db.table("order_items").select("*").eq("order_id", str(order_id)).execute()
-    
-    order_data = order.data[0]
-    order_data["items"] = items.data
-    return order_data
+    return order.data[0]
 
 
 @router.patch("/orders/{order_id}", response_model=OrderResponse)
@@ -262,45 +377,54 @@ async def update_order_status(
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
     
-    result = db.table("orders").update(update_data).eq("id", str(order_id)).execute()
+    if isinstance(db, PostgresClient):
+        # Direct PostgreSQL: update and fetch items in one statement.
+        # Column names come from OrderStatusUpdate's fields, never from input.
+        set_clause = ", ".join(f"{col} = %s" for col in update_data)
+        result = db.table("orders").raw_sql(
+            f"""
+            WITH updated AS (
+                UPDATE orders SET {set_clause} WHERE id = %s RETURNING *
+            )
+            SELECT updated.*, (
+                SELECT COALESCE(jsonb_agg(oi), '[]'::jsonb)
+                FROM order_items oi WHERE oi.order_id = updated.id
+            ) AS items
+            FROM updated
+            """,
+            [*update_data.values(), str(order_id)],
+        ).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Order not found")
+        return result.data[0]
+    
+    # return=representation with the items embedded: one round-trip
+    result = db.table("orders").update(update_data).eq("id", str(order_id)) \
+        .select(ORDER_WITH_ITEMS).execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="Order not found")
-    
-    items = db.table("order_items").select("*").eq("order_id", str(order_id)).execute()
-    order_data = result.data[0]
-    order_data["items"] = items.data
-    return order_data
+    return result.data[0]
 
 
 # =====================================================
 # BLOG POSTS
 # =====================================================
-@router.get("/blog", response_model=PaginatedResponse)
+@router.get("/blog")
 async def list_blog_posts(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     is_published: Optional[bool] = None,
+    count_mode: CountMode = "estimated",
+    cursor: Optional[str] = None,
     db: Client = Depends(get_supabase_admin)
 ):
-    """List blog posts."""
-    query = db.table("blog_posts").select("*", count="exact")
+    """List blog posts (pass next_cursor back as cursor for keyset paging)."""
+    query = _select_for_list(db, "blog_posts", count_mode, cursor, BLOG_LIST_COLUMNS)
     
     if is_published is not None:
         query = query.eq("is_published", is_published)
     
-    offset = (page - 1) * page_size
-    query = query.order("created_at", desc=True).range(offset, offset + page_size - 1)
-    
-    result = query.execute()
-    total = result.count or 0
-    
-    return PaginatedResponse(
-        items=result.data,
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=(total + page_size - 1) // page_size
-    )
+    return RowsJSONResponse(_list_page(query, "created_at", page, page_size, cursor, count_mode))
 
 
 @router.post("/blog", response_model=BlogPostResponse)
@@ -311,8 +435,7 @@ async def create_blog_post(
     """Create a new blog post."""
     data = post.model_dump()
     if data.get("is_published"):
-        from datetime import datetime
-        data["published_at"] = datetime.utcnow().isoformat()
+        data["published_at"] = datetime.now(timezone.utc).isoformat()
     
     result = db.table("blog_posts").insert(data).execute()
     if not result.data:
@@ -345,8 +468,7 @@ async def update_blog_post(
     
     # Set published_at when publishing
     if update_data.get("is_published"):
-        from datetime import datetime
-        update_data["published_at"] = datetime.utcnow().isoformat()
+        update_data["published_at"] = datetime.now(timezone.utc).isoformat()
     
     result = db.table("blog_posts").update(update_data).eq("id", str(post_id)).execute()
     if not result.data:
@@ -367,6 +489,46 @@ async def delete_blog_post(
 # =====================================================
 # SOCIAL FEED (Facebook Sync)
 # =====================================================
+def _load_settings(db) -> dict:
+    result = db.table("settings").select("*").execute()
+    # Convert to dict
+    return {item["key"]: item["value"] for item in result.data}
+
+
+async def _fb_settings(db) -> dict:
+    """
+    The fb_sync setting, from the cached settings (dashboards poll the sync
+    endpoints every few seconds). A copy, so callers can modify it freely.
+    """
+    all_settings = await settings_cache.get_settings(partial(_load_settings, db))
+    return dict(all_settings.get("fb_sync") or {})
+
+
+def _count_social_feed(db) -> int:
+    """Exact row count of social_feed (a table scan; sync keeps a running total in settings)."""
+    total_result = db.table("social_feed").select("id", count="exact").execute()
+    return total_result.count if total_result.count is not None else len(total_result.data)
+
+
+def _store_social_posts(db, posts: list) -> tuple[int, int]:
+    """
+    Write a batch of Facebook posts to social_feed; returns (new, updated).
+    One lookup tells new posts from refreshed ones, then one upsert per chunk:
+    INSERT ... ON CONFLICT (post_id) DO UPDATE refreshes the Facebook fields
+    (image_urls, post_type, ...) of posts already stored.
+    """
+    if not posts:
+        return 0, 0
+    existing_result = db.table("social_feed").select("post_id").in_(
+        "post_id", [p["post_id"] for p in posts]
+    ).execute()
+    existing = {row["post_id"] for row in existing_result.data or []}
+    for chunk in chunked(posts):
+        db.table("social_feed").upsert(chunk, on_conflict="post_id").execute()
+    updated = sum(1 for p in posts if p["post_id"] in existing)
+    return len(posts) - updated, updated
+
+
 @router.post("/social/sync")
 async def sync_facebook(
     request: SocialSyncRequest = SocialSyncRequest(),
@@ -380,8 +542,7 @@ async def sync_facebook(
     fb = get_fb_service()
     
     # Get settings including saved cursor
-    settings_result = db.table("settings").select("value").eq("key", "fb_sync").execute()
-    fb_settings = settings_result.data[0]["value"] if settings_result.data else {}
+    fb_settings = await _fb_settings(db)
     
     # Set credentials from settings
     db_page_id = fb_settings.get("page_id")
@@ -402,53 +563,34 @@ async def sync_facebook(
             saved_cursor = None
         
         # Fetch ONE batch of posts
-        posts, next_cursor, has_more = fb.fetch_posts_batch(
+        posts, next_cursor, has_more = await asyncio.to_thread(
+            fb.fetch_posts_batch,
             batch_size=batch_size,
             cursor=saved_cursor,
             days_back=days_back
         )
         
         # Process and save posts
-        synced_count = 0
-        updated_count = 0
-        
-        for item in posts:
-            caption = item.get("caption") or ""
-            if len(caption) < min_length:
-                continue
-
-            existing = db.table("social_feed").select("id").eq("post_id", item["post_id"]).execute()
-            
-            if existing.data:
-                db.table("social_feed").update({
-                    "image_urls": item.get("image_urls", []),
-                    "post_type": item.get("post_type"),
-                }).eq("post_id", item["post_id"]).execute()
-                updated_count += 1
-            else:
-                db.table("social_feed").insert(item).execute()
-                synced_count += 1
-        
-        # Update settings with new cursor
-        from datetime import datetime
-        new_settings = {
-            **fb_settings,
-            "page_id": fb.page_id,
-            "last_sync": datetime.utcnow().isoformat(),
-            "sync_cursor": next_cursor if has_more else None,  # Clear cursor when done
-            "sync_in_progress": has_more,
-        }
+        items = [i for i in posts if len(i.get("caption") or "") >= min_length]
         
-        settings_payload = {"key": "fb_sync", "value": new_settings}
+        synced_count, updated_count = await asyncio.to_thread(_store_social_posts, db, items)
         
-        if settings_result.data:
-            db.table("settings").update(settings_payload).eq("key", "fb_sync").execute()
-        else:
-            db.table("settings").insert(settings_payload).execute()
-        
-        # Get total synced count
-        total_result = db.table("social_feed").select("id", count="exact").execute()
-        total_in_db = total_result.count if hasattr(total_result, 'count') else len(total_result.data)
+        # One call merges the new cursor into settings and advances the running
+        # total kept there (so status polls don't COUNT the table); a reset
+        # recounts it
+        finish = db.rpc("fb_sync_finish", {
+            "p_settings": {
+                "page_id": fb.page_id,
+                "last_sync": datetime.now(timezone.utc).isoformat(),
+                "sync_cursor": next_cursor if has_more else None,  # Clear cursor when done
+                "sync_in_progress": has_more,
+            },
+            "p_synced": synced_count,
+            "p_recount": bool(request.reset),
+        })
+        result = await asyncio.to_thread(finish.execute)
+        total_in_db = result.data[0]["value"]["total_in_db"]
+        await settings_cache.invalidate_settings()
         
         return {
             "message": f"Batch complete: {synced_count} new, {updated_count} updated",
@@ -462,15 +604,30 @@ async def sync_facebook(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
-    except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
 
 
+@router.post("/social/sync/background", status_code=202)
+async def sync_facebook_background():
+    """
+    Start an incremental Facebook sync (posts since the last completed
+    background run) without holding the request open.
+    Poll GET /social/sync/{task_id} for progress.
+    """
+    task_id = await fb_sync_worker.enqueue_sync()
+    return {"task_id": task_id, "status": "queued"}
+
+
+@router.get("/social/sync/{task_id}")
+async def get_sync_job(task_id: str):
+    """Status of a background Facebook sync."""
+    job = await fb_sync_worker.get_job(task_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Sync task not found")
+    return job
+
+
 @router.get("/social/sync-status")
 async def get_sync_status(
     refresh_count: bool = False,
@@ -483,8 +640,7 @@ async def get_sync_status(
     fb = get_fb_service()
     
     # Get settings
-    settings_result = db.table("settings").select("value").eq("key", "fb_sync").execute()
-    fb_settings = settings_result.data[0]["value"] if settings_result.data else {}
+    fb_settings = await _fb_settings(db)
     
     # Set credentials
     db_page_id = fb_settings.get("page_id")
@@ -492,21 +648,31 @@ async def get_sync_status(
     if db_page_id and db_token:
         fb.set_credentials(db_page_id, db_token)
     
-    # Get total posts in database
-    total_result = db.table("social_feed").select("id", count="exact").execute()
-    total_in_db = total_result.count if hasattr(total_result, 'count') else len(total_result.data)
-    
     # Get or refresh FB total count
     fb_total = fb_settings.get("fb_total_posts", 0)
+    # Rows in the database: the running total kept by sync, recounted on refresh
+    total_in_db = fb_settings.get("total_in_db")
     
     if refresh_count and db_page_id and db_token:
+        counts = {}
         try:
-            fb_total = fb.get_total_posts_count()
-            # Store updated count
-            fb_settings["fb_total_posts"] = fb_total
-            db.table("settings").update({"value": fb_settings}).eq("key", "fb_sync").execute()
+            fb_total = await asyncio.to_thread(fb.get_total_posts_count)
+            counts["fb_total_posts"] = fb_total
         except Exception as e:
             print(f"Failed to get FB count: {e}")
+        # Merge just the counts (recounting total_in_db) under the row lock;
+        # fb_settings comes from a cache and may predate a sync batch's cursor
+        finish = db.rpc("fb_sync_finish", {
+            "p_settings": counts,
+            "p_synced": 0,
+            "p_recount": True,
+        })
+        result = await asyncio.to_thread(finish.execute)
+        fb_settings = result.data[0]["value"]
+        total_in_db = fb_settings["total_in_db"]
+        await settings_cache.invalidate_settings()
+    elif total_in_db is None:
+        total_in_db = await asyncio.to_thread(_count_social_feed, db)
     
     sync_cursor = fb_settings.get("sync_cursor")
     last_sync = fb_settings.get("last_sync")
@@ -537,8 +703,7 @@ async def sync_all_facebook(
     fb = get_fb_service()
     
     # Get settings
-    settings_result = db.table("settings").select("value").eq("key", "fb_sync").execute()
-    fb_settings = settings_result.data[0]["value"] if settings_result.data else {}
+    fb_settings = await _fb_settings(db)
     
     db_page_id = fb_settings.get("page_id")
     db_token = fb_settings.get("access_token")
@@ -548,49 +713,66 @@ async def sync_all_facebook(
     try:
         all_synced = 0
         all_updated = 0
-        cursor = None
         batch_num = 0
         total_fetched = 0
         
-        # Loop through all pages
-        while True:
-            batch_num += 1
-            posts, next_cursor, has_more = fb.fetch_posts_batch(
-                batch_size=50,  # Larger batch for sync-all
-                cursor=cursor
+        # Posts are buffered (keyed by post_id, so a post that shifts across
+        # pages mid-sync isn't upserted twice in one statement) and written
+        # WRITE_CHUNK_SIZE at a time. Each write runs as a task, so the next
+        # Facebook pages are fetched while it is in flight; at most one write
+        # runs at a time.
+        buffer: dict = {}
+        write: Optional[asyncio.Task] = None
+        
+        async def wait_for_write() -> None:
+            nonlocal write, all_synced, all_updated
+            if write:
+                synced, updated = await write
+                all_synced += synced
+                all_updated += updated
+                write = None
+        
+        def start_write() -> None:
+            nonlocal write
+            write = asyncio.create_task(
+                asyncio.to_thread(_store_social_posts, db, list(buffer.values()))
             )
-            
-            total_fetched += len(posts)
-            
-            for item in posts:
-                existing = db.table("social_feed").select("id").eq("post_id", item["post_id"]).execute()
-                
-                if existing.data:
-                    db.table("social_feed").update({
-                        "image_urls": item.get("image_urls", []),
-                        "post_type": item.get("post_type"),
-                    }).eq("post_id", item["post_id"]).execute()
-                    all_updated += 1
-                else:
-                    db.table("social_feed").insert(item).execute()
-                    all_synced += 1
-            
-            cursor = next_cursor
-            if not has_more:
-                break
+            buffer.clear()
         
-        # Update settings
-        from datetime import datetime
-        new_settings = {
-            **fb_settings,
-            "page_id": fb.page_id,
-            "last_sync": datetime.utcnow().isoformat(),
-            "sync_cursor": None,
-            "sync_in_progress": False,
-            "fb_total_posts": total_fetched,
-        }
+        try:
+            async for posts in fb.iter_posts(batch_size=50):  # Larger batch for sync-all
+                batch_num += 1
+                total_fetched += len(posts)
+                buffer.update((p["post_id"], p) for p in posts)
+                if len(buffer) >= WRITE_CHUNK_SIZE:
+                    await wait_for_write()
+                    start_write()
+            await wait_for_write()
+            if buffer:
+                start_write()
+                await wait_for_write()
+        finally:
+            if write:
+                write.cancel()
         
-        db.table("settings").update({"key": "fb_sync", "value": new_settings}).eq("key", "fb_sync").execute()
+        # Merge only what this sync changed under fb_sync_finish's row lock;
+        # fb_settings was read (possibly from cache) before the first page and
+        # writing it back whole would drop credentials or counts saved meanwhile.
+        # A full sync recounts total_in_db rather than adding to a stale copy.
+        finish = db.rpc("fb_sync_finish", {
+            "p_settings": {
+                "page_id": fb.page_id,
+                "last_sync": datetime.now(timezone.utc).isoformat(),
+                "sync_cursor": None,
+                "sync_in_progress": False,
+                "fb_total_posts": total_fetched,
+            },
+            "p_synced": all_synced,
+            "p_recount": True,
+        })
+        result = await asyncio.to_thread(finish.execute)
+        total_in_db = result.data[0]["value"]["total_in_db"]
+        await settings_cache.invalidate_settings()
         
         return {
             "message": f"Synced all: {all_synced} new, {all_updated} updated",
@@ -598,10 +780,10 @@ async def sync_all_facebook(
             "updated": all_updated,
             "total_fetched": total_fetched,
             "batches": batch_num,
+            "total_in_db": total_in_db,
         }
         
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
 
@@ -619,35 +801,25 @@ async def pin_social_post(
     return {"message": f"Post {'pinned' if is_pinned else 'unpinned'}", "id": str(feed_id)}
 
 
-@router.get("/social/feed", response_model=PaginatedResponse)
+@router.get("/social/feed")
 async def list_social_feed(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     platform: Optional[str] = None,
     imported: Optional[bool] = None,
+    count_mode: CountMode = "estimated",
+    cursor: Optional[str] = None,
     db: Client = Depends(get_supabase_admin)
 ):
-    """List synced social media posts."""
-    query = db.table("social_feed").select("*", count="exact")
+    """List synced social media posts (pass next_cursor back as cursor for keyset paging)."""
+    query = _select_for_list(db, "social_feed", count_mode, cursor)
     
     if platform:
         query = query.eq("platform", platform)
     if imported is not None:
         query = query.eq("is_imported_as_product", imported)
     
-    offset = (page - 1) * page_size
-    query = query.order("posted_at", desc=True).range(offset, offset + page_size - 1)
-    
-    result = query.execute()
-    total = result.count or 0
-    
-    return PaginatedResponse(
-        items=result.data,
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=(total + page_size - 1) // page_size
-    )
+    return RowsJSONResponse(_list_page(query, "posted_at", page, page_size, cursor, count_mode))
 
 
 @router.post("/social/{feed_id}/import-product", response_model=ProductResponse)
@@ -657,64 +829,21 @@ async def import_as_product(
     db: Client = Depends(get_supabase_admin)
 ):
     """Import a social feed item as a new product."""
-    # Get the feed item
-    feed = db.table("social_feed").select("*").eq("id", str(feed_id)).execute()
-    if not feed.data:
-        raise HTTPException(status_code=404, detail="Social feed item not found")
-    
-    feed_item = feed.data[0]
-    
-    # Create slug from name - remove Vietnamese accents
-    import re
-    import unicodedata
-    # Normalize and remove Vietnamese diacritics
-    name_normalized = unicodedata.normalize('NFD', data.name_vi)
-    name_ascii = ''.join(c for c in name_normalized if unicodedata.category(c) != 'Mn')
-    name_ascii = name_ascii.replace('đ', 'd').replace('Đ', 'D')
-    slug = re.sub(r'[^a-z0-9]+', '-', name_ascii.lower()).strip('-')
-    
-    # Get all images from feed item (images array or fallback to image_url)
-    feed_images = feed_item.get("image_urls") or []
-    if not feed_images and feed_item.get("image_url"):
-        feed_images = [{"url": feed_item["image_url"]}]
-    
-    # Create product images array with all feed images
-    product_images = []
-    for i, img in enumerate(feed_images):
-        if isinstance(img, dict):
-            url = img.get("url")
-        else:
-            url = img
-            
-        if url:
-            product_images.append({
-                "url": url, 
-                "alt": data.name_vi, 
-                "sort_order": i
-            })
-    
-    # Create product
-    product_data = {
-        "slug": slug,
-        "name_vi": data.name_vi,
-        "name_en": data.name_en,
-        "price": data.price,
-        "category_id": str(data.category_id) if data.category_id else None,
-        "images": product_images,
-        "description_vi": feed_item.get("caption"),
-        "fb_post_id": feed_item["post_id"],
-        "is_published": False  # Draft by default
-    }
-    
-    result = db.table("products").insert(product_data).execute()
+    slug = _slugify(data.name_vi)
+    
+    # Read feed, insert draft product (images/caption from the feed, slug
+    # suffixed on collision) and mark the feed imported in one transaction
+    result = db.rpc("import_feed_as_product", {
+        "p_feed_id": str(feed_id),
+        "p_slug": slug,
+        "p_name_vi": data.name_vi,
+        "p_name_en": data.name_en,
+        "p_price": data.price,
+        "p_category_id": str(data.category_id) if data.category_id else None,
+    }).execute()
     if not result.data:
-        raise HTTPException(status_code=400, detail="Failed to create product")
-    
-    # Mark feed item as imported
-    db.table("social_feed").update({
-        "is_imported_as_product": True,
-        "imported_product_id": result.data[0]["id"]
-    }).eq("id", str(feed_id)).execute()
+        raise HTTPException(status_code=404, detail="Social feed item not found")
+    await catalog_cache.invalidate_products()
     
     return result.data[0]
 
@@ -728,36 +857,36 @@ async def bulk_import_as_products(
     Bulk import multiple social feed items as products.
     Category is required, price is optional (defaults to 0).
     """
-    import re
-    import unicodedata
     
     imported = []
     failed = []
+    pending = []
+    
+    # 1) Load every requested feed item in one query
+    feed_ids = list(dict.fromkeys(str(item.feed_id) for item in data.items))
+    feeds = db.table("social_feed").select(
+        "id, platform, post_id, caption, image_url, image_urls, is_imported_as_product"
+    ).in_("id", feed_ids).execute()
+    feeds_by_id = {str(row["id"]): row for row in feeds.data or []}
     
+    seen = set()
     for item in data.items:
         try:
-            # Get the feed item
-            feed = db.table("social_feed").select("*").eq("id", str(item.feed_id)).execute()
-            if not feed.data:
+            feed_item = feeds_by_id.get(str(item.feed_id))
+            if not feed_item:
                 failed.append({"feed_id": str(item.feed_id), "error": "Feed item not found"})
                 continue
-                
-            feed_item = feed.data[0]
             
-            # Skip if already imported
-            if feed_item.get("is_imported_as_product"):
+            # Skip if already imported (earlier, or by a repeat of this feed_id
+            # in the same request: one feed row can't be marked twice in the batch)
+            if feed_item.get("is_imported_as_product") or str(item.feed_id) in seen:
                 failed.append({"feed_id": str(item.feed_id), "error": "Already imported"})
                 continue
+            seen.add(str(item.feed_id))
             
-            # Create slug from name - remove Vietnamese accents
-            name_normalized = unicodedata.normalize('NFD', item.name_vi)
-            name_ascii = ''.join(c for c in name_normalized if unicodedata.category(c) != 'Mn')
-            name_ascii = name_ascii.replace('đ', 'd').replace('Đ', 'D')
-            slug = re.sub(r'[^a-z0-9]+', '-', name_ascii.lower()).strip('-')
-            
-            # Ensure unique slug by appending timestamp
-            from datetime import datetime
-            slug = f"{slug}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            # Random suffix: items imported in the same second (or with the
+            # same name) must not collide inside the single batch insert
+            slug = f"{_slugify(item.name_vi)}-{uuid4().hex[:8]}"
             
             # Get all images from feed item
             feed_images = feed_item.get("image_urls") or []
@@ -780,7 +909,7 @@ async def bulk_import_as_products(
                     })
             
             # Create product with category (price defaults to 0 if not provided)
-            product_data = {
+            pending.append((item, feed_item, {
                 "slug": slug,
                 "name_vi": item.name_vi,
                 "name_en": item.name_en,
@@ -790,28 +919,47 @@ async def bulk_import_as_products(
                 "description_vi": feed_item.get("caption"),
                 "fb_post_id": feed_item["post_id"],
                 "is_published": False  # Draft by default
-            }
-            
-            result = db.table("products").insert(product_data).execute()
-            if not result.data:
-                failed.append({"feed_id": str(item.feed_id), "error": "Failed to create product"})
-                continue
-            
-            # Mark feed item as imported
-            db.table("social_feed").update({
-                "is_imported_as_product": True,
-                "imported_product_id": result.data[0]["id"]
-            }).eq("id", str(item.feed_id)).execute()
-            
-            imported.append({
-                "feed_id": str(item.feed_id),
-                "product_id": result.data[0]["id"],
-                "name": item.name_vi
-            })
+            }))
             
         except Exception as e:
             failed.append({"feed_id": str(item.feed_id), "error": str(e)})
     
+    # 2) Insert all products in one batch
+    created = {}
+    if pending:
+        try:
+            result = db.table("products").insert([row for _, _, row in pending]).execute()
+            created = {p["fb_post_id"]: p for p in result.data or []}
+            await catalog_cache.invalidate_products()
+        except Exception as e:
+            failed.extend({"feed_id": str(item.feed_id), "error": str(e)} for item, _, _ in pending)
+            pending = []
+    
+    marks = []
+    for item, feed_item, product_data in pending:
+        product = created.get(product_data["fb_post_id"])
+        if not product:
+            failed.append({"feed_id": str(item.feed_id), "error": "Failed to create product"})
+            continue
+        
+        # platform/post_id ride along so the upsert row satisfies NOT NULL
+        marks.append({
+            "id": feed_item["id"],
+            "platform": feed_item["platform"],
+            "post_id": feed_item["post_id"],
+            "is_imported_as_product": True,
+            "imported_product_id": product["id"]
+        })
+        imported.append({
+            "feed_id": str(item.feed_id),
+            "product_id": product["id"],
+            "name": item.name_vi
+        })
+    
+    # 3) Mark all imported feed items in one upsert on id
+    if marks:
+        db.table("social_feed").upsert(marks, on_conflict="id").execute()
+    
     return {
         "message": f"Imported {len(imported)} products, {len(failed)} failed",
         "imported": imported,
@@ -829,9 +977,7 @@ async def get_settings(
     db: Client = Depends(get_supabase_admin)
 ):
     """Get all settings."""
-    result = db.table("settings").select("*").execute()
-    # Convert to dict
-    return {item["key"]: item["value"] for item in result.data}
+    return await settings_cache.get_settings(partial(_load_settings, db))
 
 
 @router.patch("/settings/{key}")
@@ -847,5 +993,6 @@ async def update_setting(
     # If not found (no data returned), insert new
     if not result.data:
         result = db.table("settings").insert({"key": key, "value": value}).execute()
-        
+    
+    await settings_cache.invalidate_settings()
     return result.data[0]
@@ -1,13 +1,18 @@
 """
 AI Router - Recommendations, Smart Search, and Tracking
 """
-from fastapi import APIRouter, HTTPException, Query, Body
+import asyncio
+import logging
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Body, UploadFile, File
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from uuid import UUID
 from app.services.recommendations import RecommendationEngine
 from app.services.smart_search import SmartSearchService
 from app.services.interaction_tracker import InteractionTracker
+from app.services.visual_search import VisualSearchService
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ai", tags=["AI Features"])
 
@@ -190,11 +195,24 @@ async def get_search_suggestions(
 # VISUAL SEARCH
 # =====================================================
 
-from fastapi import UploadFile, File
-from app.services.visual_search import VisualSearchService
-
 visual_search = VisualSearchService()
 
+MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
+READ_CHUNK_SIZE = 64 * 1024
+
+
+async def _read_image(image: UploadFile) -> bytes:
+    """Read an upload, rejecting it as soon as it is known to exceed MAX_IMAGE_SIZE."""
+    too_large = HTTPException(status_code=400, detail="Image too large (max 10MB)")
+    if (image.size or 0) > MAX_IMAGE_SIZE:
+        raise too_large
+    buf = bytearray()
+    while chunk := await image.read(READ_CHUNK_SIZE):
+        buf.extend(chunk)
+        if len(buf) > MAX_IMAGE_SIZE:
+            raise too_large
+    return bytes(buf)
+
 
 @router.post("/visual-search")
 async def search_by_image(
@@ -213,12 +231,8 @@ async def search_by_image(
     Returns products ranked by visual similarity
     """
     try:
-        # Read image bytes
-        image_bytes = await image.read()
-        
-        # Validate file size (10MB max)
-        if len(image_bytes) > 10 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="Image too large (max 10MB)")
+        # Read image bytes (10MB max)
+        image_bytes = await _read_image(image)
         
         # Perform visual search
         results = await visual_search.search_by_image(
@@ -234,6 +248,8 @@ async def search_by_image(
             "count": len(results)
         }
         
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -246,7 +262,7 @@ async def search_by_image(
 # =====================================================
 
 @router.post("/track")
-async def track_interaction(event: InteractionEvent):
+async def track_interaction(event: InteractionEvent, background_tasks: BackgroundTasks):
     """
     Track user interaction events for AI/ML
     
@@ -256,20 +272,20 @@ async def track_interaction(event: InteractionEvent):
     - **remove_from_cart**: Removed from cart
     - **purchase**: Completed purchase
     - **search**: Performed search
+    
+    The event is written after the response is sent; the client doesn't
+    wait on the insert (track_event logs failures instead of raising).
     """
-    try:
-        await interaction_tracker.track_event(
-            session_id=event.session_id,
-            event_type=event.event_type,
-            product_id=event.product_id,
-            category_id=event.category_id,
-            user_id=event.user_id,
-            metadata=event.metadata
-        )
-        return {"success": True}
-    except Exception as e:
-        # Don't fail user requests due to tracking errors
-        return {"success": False, "error": str(e)}
+    background_tasks.add_task(
+        interaction_tracker.track_event,
+        session_id=event.session_id,
+        event_type=event.event_type,
+        product_id=event.product_id,
+        category_id=event.category_id,
+        user_id=event.user_id,
+        metadata=event.metadata
+    )
+    return {"success": True}
 
 
 # =====================================================
@@ -299,28 +315,13 @@ async def get_ai_stats():
     try:
         db = recommendation_engine.db
         
-        # Get interaction counts
-        interactions = await db.table("user_interactions") \
-            .select("event_type", count="exact") \
-            .execute()
-        
-        # Get search query count
-        searches = await db.table("search_queries") \
-            .select("*", count="exact") \
-            .execute()
-        
-        # Get recommendation clicks
-        rec_clicks = await db.table("recommendation_clicks") \
-            .select("*", count="exact") \
-            .execute()
+        # All three table counts in one round trip; the client is sync, so
+        # the call runs off the event loop
+        result = await asyncio.to_thread(db.rpc("ai_stats").execute)
         
         return {
             "success": True,
-            "stats": {
-                "total_interactions": interactions.count,
-                "total_searches": searches.count,
-                "total_recommendation_clicks": rec_clicks.count
-            }
+            "stats": result.data[0]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -2,15 +2,31 @@
 Authentication router.
 Handles admin login/logout.
 """
+import time
+from typing import Optional
+
+from cachetools import TTLCache
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, EmailStr
 from supabase import Client
 
 from app.database import get_supabase_admin
-from app.core.security import create_access_token, hash_password, verify_password, decode_token
+from app.core.security import (
+    create_access_token,
+    decode_token,
+    hash_password,
+    is_token_revoked,
+    revoke_token,
+    token_digest,
+    verify_password,
+)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+# /me responses by token digest: (user, expires_at). An entry lives at most
+# 5 minutes and never past the token's exp; only successful lookups are stored.
+_USER_CACHE: TTLCache = TTLCache(maxsize=2048, ttl=300)
+
 
 class LoginRequest(BaseModel):
     email: EmailStr
@@ -39,8 +55,14 @@ async def login(
     Admin login endpoint.
     Returns JWT token for authenticated sessions.
     """
-    # Find user by email
-    result = db.table("profiles").select("*").eq("email", credentials.email).execute()
+    # Find user by email (profiles.email is UNIQUE, so this is one index lookup)
+    result = (
+        db.table("profiles")
+        .select("id, email, full_name, role, password_hash")
+        .eq("email", credentials.email)
+        .limit(1)
+        .execute()
+    )
     
     if not result.data:
         raise HTTPException(status_code=401, detail="Email hoặc mật khẩu không đúng")
@@ -83,11 +105,15 @@ async def login(
 
 
 @router.post("/logout")
-async def logout():
+async def logout(token: Optional[str] = None):
     """
     Logout endpoint.
-    Client should clear the token locally.
+    Client should clear the token locally; if it is passed, it is also
+    rejected by this server from now on.
     """
+    if token:
+        revoke_token(token)
+        _USER_CACHE.pop(token_digest(token), None)
     return {"message": "Đăng xuất thành công"}
 
 
@@ -100,22 +126,35 @@ async def get_current_user(
     Get current authenticated user info.
     Token should be passed as query parameter.
     """
+    key = token_digest(token)
+    if is_token_revoked(key):
+        raise HTTPException(status_code=401, detail="Token không hợp lệ")
+    
+    cached = _USER_CACHE.get(key)
+    if cached is not None:
+        user_response, expires_at = cached
+        if expires_at > time.time():
+            return user_response
+        _USER_CACHE.pop(key, None)
+    
     token_data = decode_token(token)
     
     if not token_data:
         raise HTTPException(status_code=401, detail="Token không hợp lệ")
     
     # Get fresh user data
-    result = db.table("profiles").select("*").eq("id", token_data.user_id).execute()
+    result = db.table("profiles").select("id, email, full_name, role").eq("id", token_data.user_id).execute()
     
     if not result.data:
         raise HTTPException(status_code=404, detail="Người dùng không tồn tại")
     
     user = result.data[0]
     
-    return UserResponse(
+    user_response = UserResponse(
         id=user["id"],
         email=user["email"],
         full_name=user.get("full_name"),
         role=user["role"]
     )
+    _USER_CACHE[key] = (user_response, token_data.exp or float("inf"))
+    return user_response
@@ -1,16 +1,20 @@
 """
 Occasions Router - API endpoints for managing occasions
 """
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List
 from datetime import date
+from app.core.responses import RowsJSONResponse
 from app.services.occasion_service import OccasionService
+from app.workers.reminder_worker import ReminderWorker
 from app.dependencies import get_current_user
 
 router = APIRouter(prefix="/occasions", tags=["Occasions"])
 
 occasion_service = OccasionService()
+reminder_worker = ReminderWorker()
 
 
 # =====================================================
@@ -18,6 +22,8 @@ occasion_service = OccasionService()
 # =====================================================
 
 class OccasionCreate(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     occasion_type: str = Field(..., description="Type: birthday, anniversary, etc.")
     occasion_name: str = Field(..., description="Name like 'Mom's Birthday'")
     recipient_name: Optional[str] = None
@@ -30,6 +36,8 @@ class OccasionCreate(BaseModel):
 
 
 class OccasionUpdate(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     occasion_name: Optional[str] = None
     recipient_name: Optional[str] = None
     occasion_date: Optional[date] = None
@@ -57,7 +65,7 @@ async def create_occasion(
     try:
         result = await occasion_service.create_occasion(
             user_id=current_user['id'],
-            occasion_data=occasion.dict()
+            occasion_data=occasion.model_dump(mode="json")
         )
         
         return {
@@ -81,11 +89,12 @@ async def list_occasions(
             upcoming_only=upcoming_only
         )
         
-        return {
+        # Rows are plain JSON already: encode them directly with orjson
+        return RowsJSONResponse({
             "success": True,
             "occasions": occasions,
             "count": len(occasions)
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -98,19 +107,16 @@ async def get_occasion(
 ):
     """Get a specific occasion"""
     try:
-        occasion = await occasion_service.get_occasion(occasion_id)
+        # Scoped to the owner: someone else's occasion is simply not found
+        occasion = await occasion_service.get_user_occasion(occasion_id, current_user['id'])
         
         if not occasion:
             raise HTTPException(status_code=404, detail="Occasion not found")
         
-        # Verify ownership
-        if occasion['user_id'] != current_user['id']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        return {
+        return RowsJSONResponse({
             "success": True,
             "occasion": occasion
-        }
+        })
         
     except HTTPException:
         raise
@@ -126,18 +132,14 @@ async def update_occasion(
 ):
     """Update an occasion"""
     try:
-        # Verify ownership
-        occasion = await occasion_service.get_occasion(occasion_id)
-        if not occasion:
-            raise HTTPException(status_code=404, detail="Occasion not found")
-        if occasion['user_id'] != current_user['id']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        # Update
-        result = await occasion_service.update_occasion(
+        # Ownership is part of the UPDATE's filter
+        result = await occasion_service.update_occasion_if_owner(
             occasion_id=occasion_id,
-            updates={k: v for k, v in updates.dict().items() if v is not None}
+            user_id=current_user['id'],
+            updates=updates.model_dump(mode="json", exclude_none=True)
         )
+        if not result:
+            raise HTTPException(status_code=404, detail="Occasion not found")
         
         return {
             "success": True,
@@ -157,14 +159,10 @@ async def delete_occasion(
 ):
     """Delete an occasion"""
     try:
-        # Verify ownership
-        occasion = await occasion_service.get_occasion(occasion_id)
-        if not occasion:
+        # Ownership is part of the DELETE's filter
+        deleted = await occasion_service.delete_occasion_if_owner(occasion_id, current_user['id'])
+        if not deleted:
             raise HTTPException(status_code=404, detail="Occasion not found")
-        if occasion['user_id'] != current_user['id']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        await occasion_service.delete_occasion(occasion_id)
         
         return {
             "success": True,
@@ -185,23 +183,23 @@ async def get_occasion_recommendations(
 ):
     """Get personalized product recommendations for an occasion"""
     try:
-        # Verify ownership
-        occasion = await occasion_service.get_occasion(occasion_id)
+        # The recommendation query is read-only, so run it alongside the
+        # ownership-scoped fetch and discard it if the occasion isn't the user's
+        occasion, recommendations = await asyncio.gather(
+            occasion_service.get_user_occasion(occasion_id, current_user['id']),
+            occasion_service.get_occasion_recommendations(
+                occasion_id=occasion_id,
+                limit=limit
+            )
+        )
         if not occasion:
             raise HTTPException(status_code=404, detail="Occasion not found")
-        if occasion['user_id'] != current_user['id']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        recommendations = await occasion_service.get_occasion_recommendations(
-            occasion_id=occasion_id,
-            limit=limit
-        )
         
-        return {
+        return RowsJSONResponse({
             "success": True,
             "occasion": occasion,
             "recommendations": recommendations
-        }
+        })
         
     except HTTPException:
         raise
@@ -237,11 +235,8 @@ async def trigger_reminders(dry_run: bool = False):
     
     In production, this would be called by a cron job
     """
-    from app.workers.reminder_worker import ReminderWorker
-    
     try:
-        worker = ReminderWorker()
-        result = await worker.send_reminders(dry_run=dry_run)
+        result = await reminder_worker.send_reminders(dry_run=dry_run)
         
         return result
         
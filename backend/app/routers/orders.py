@@ -2,40 +2,117 @@
 Order/Checkout API routes.
 Handles cart checkout, order creation, and payment processing.
 """
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import re
+import threading
+from collections import Counter
+import stripe
+from fastapi import APIRouter, Depends, HTTPException, Request
 from uuid import UUID
-from datetime import datetime, date
+from datetime import datetime, timezone
+from functools import lru_cache
+from cachetools import TTLCache
+from postgrest.exceptions import APIError
+from pydantic import TypeAdapter, ValidationError
 from supabase import Client
 
-from app.database import get_supabase_admin
+from app.database import ORDER_WITH_ITEMS, get_supabase_admin
 from app.config import get_settings
-from app.schemas.schemas import OrderCreate, OrderResponse
+from app.schemas.schemas import OrderCreate, OrderResponse, StripeEvent
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 settings = get_settings()
 
+if settings.stripe_secret_key:
+    stripe.api_key = settings.stripe_secret_key
+
+
+# In real app, fetch from settings table
+DISTRICT_FEES = {
+    "1": 25000,
+    "3": 25000,
+    "5": 30000,
+    "7": 35000,
+    "tan_binh": 35000,
+    "go_vap": 40000,
+}
+DEFAULT_DELIVERY_FEE = 35000  # VND
+
 
-def generate_order_number() -> str:
-    """Generate unique order number: YF-YYYYMMDD-XXX"""
-    today = date.today().strftime("%Y%m%d")
-    import random
-    suffix = str(random.randint(100, 999))
-    return f"YF-{today}-{suffix}"
+# "Quận 1" / "quan 7" / "Tan Binh" -> "1" / "7" / "tan_binh"
+_DISTRICT_TRANS = str.maketrans({" ": "_"})
+_DISTRICT_PREFIX_RE = re.compile(r"^(quận|quan)_")
 
 
+@lru_cache(maxsize=256)
 def calculate_delivery_fee(district: str) -> int:
-    """Calculate delivery fee based on district."""
-    # In real app, fetch from settings table
-    district_fees = {
-        "1": 25000,
-        "3": 25000,
-        "5": 30000,
-        "7": 35000,
-        "tan_binh": 35000,
-        "go_vap": 40000,
-    }
-    district_key = district.lower().replace(" ", "_").replace("quận ", "").replace("quan ", "")
-    return district_fees.get(district_key, 35000)  # Default 35k VND
+    """Calculate delivery fee based on district (pure; memoized per district string)."""
+    district_key = _DISTRICT_PREFIX_RE.sub("", district.strip().lower().translate(_DISTRICT_TRANS))
+    return DISTRICT_FEES.get(district_key, DEFAULT_DELIVERY_FEE)
+
+
+# Only the columns checkout reads
+CHECKOUT_PRODUCT_COLUMNS = "id, name_vi, price, sale_price, stock_quantity, is_published"
+CHECKOUT_VARIANT_COLUMNS = "id, name_vi, price_adjustment"
+DISCOUNT_COLUMNS = (
+    "id, discount_type, discount_value, min_order_value, max_uses, used_count, starts_at, expires_at"
+)
+
+# Active discount codes by code (None for unknown/inactive ones), with
+# starts_at/expires_at parsed once. Checkout runs in worker threads, hence the lock.
+_DISCOUNT_CACHE: TTLCache = TTLCache(maxsize=512, ttl=60)
+_DISCOUNT_LOCK = threading.Lock()
+_MISSING = object()
+
+
+def get_discount(db: Client, code: str) -> dict | None:
+    """Get an active discount code, served from a short-lived in-process cache."""
+    with _DISCOUNT_LOCK:
+        discount = _DISCOUNT_CACHE.get(code, _MISSING)
+    if discount is not _MISSING:
+        return discount
+    
+    result = db.table("discount_codes").select(DISCOUNT_COLUMNS).eq("code", code).eq("is_active", True).execute()
+    discount = None
+    if result.data:
+        discount = dict(result.data[0])
+        for field in ("starts_at", "expires_at"):
+            if discount.get(field):
+                discount[field] = datetime.fromisoformat(discount[field].replace("Z", "+00:00"))
+    
+    with _DISCOUNT_LOCK:
+        _DISCOUNT_CACHE[code] = discount
+    return discount
+
+
+def invalidate_discount(code: str) -> None:
+    with _DISCOUNT_LOCK:
+        _DISCOUNT_CACHE.pop(code, None)
+
+
+def discount_for(d: dict, subtotal: int, now: datetime) -> int | None:
+    """
+    Amount a cached discount code takes off this subtotal, or None if the code
+    doesn't apply (not started, expired, used up, or below its minimum order).
+    """
+    if d.get("starts_at") and d["starts_at"] > now:
+        return None
+    if d.get("expires_at") and d["expires_at"] < now:
+        return None
+    if d.get("max_uses") and d.get("used_count", 0) >= d["max_uses"]:
+        return None
+    if d.get("min_order_value") and subtotal < d["min_order_value"]:
+        return None
+    if d["discount_type"] == "percentage":
+        return int(subtotal * d["discount_value"] / 100)
+    return int(d["discount_value"])
+
+
+# Webhook bodies are parsed and validated in one step by pydantic-core
+_STRIPE_EVENT = TypeAdapter(StripeEvent)
+
+# Stripe event ids already processed (Stripe retries deliveries for up to days)
+_SEEN_EVENTS: TTLCache = TTLCache(maxsize=10000, ttl=86400)
 
 
 @router.post("/checkout", response_model=OrderResponse)
@@ -50,22 +127,79 @@ async def create_order(
     if not order_data.items:
         raise HTTPException(status_code=400, detail="Cart is empty")
     
-    # Fetch product details and validate stock
+    # The Supabase client is synchronous: run the checkout's round trips in
+    # worker threads so concurrent requests aren't stalled behind them.
+    # Every product and variant in the cart is fetched up front, one query per
+    # table, and the two reads are independent so they run side by side.
+    product_ids = list(dict.fromkeys(str(item.product_id) for item in order_data.items))
+    variant_ids = list(dict.fromkeys(
+        str(item.variant_id) for item in order_data.items if item.variant_id
+    ))
+    products_by_id, variants_by_id = await asyncio.gather(
+        asyncio.to_thread(_rows_by_id, db, "products", CHECKOUT_PRODUCT_COLUMNS, product_ids),
+        asyncio.to_thread(_rows_by_id, db, "product_variants", CHECKOUT_VARIANT_COLUMNS, variant_ids),
+    )
+    return await asyncio.to_thread(_place_order, db, order_data, products_by_id, variants_by_id)
+
+
+def _rows_by_id(db: Client, table: str, columns: str, ids: list[str]) -> dict:
+    """Fetch a table's rows by id in one IN query, keyed by str(id)."""
+    if not ids:
+        return {}
+    result = db.table(table).select(columns).in_("id", ids).execute()
+    return {str(row["id"]): row for row in result.data or []}
+
+
+# Raised by the checkout SQL functions when stock or a discount is gone
+# (PostgREST maps SQLSTATE PTxxx to HTTP xxx)
+CONFLICT_SQLSTATE = "PT409"
+# place_order's message when the discount UPDATE finds no usable row
+DISCOUNT_UNAVAILABLE = "Discount code is no longer available"
+
+
+def _db_error(exc: Exception) -> tuple[str | None, str | None]:
+    """SQLSTATE and message of a database error from either client (PostgREST APIError or psycopg2)."""
+    if isinstance(exc, APIError):
+        return exc.code, exc.message
+    diag = getattr(exc, "diag", None)
+    return getattr(exc, "pgcode", None), getattr(diag, "message_primary", None)
+
+
+def _price_discount(db: Client, code: str | None, subtotal: int) -> tuple[int, str | None]:
+    """(discount amount, discount id) for an optional code; (0, None) if it doesn't apply."""
+    if not code:
+        return 0, None
+    d = get_discount(db, code)
+    amount = discount_for(d, subtotal, datetime.now(timezone.utc)) if d else None
+    if amount is None:
+        return 0, None
+    return amount, d["id"]
+
+
+def _place_order(
+    db: Client,
+    order_data: OrderCreate,
+    products_by_id: dict,
+    variants_by_id: dict
+) -> dict:
+    # Validate stock and price the items. A product may appear on several
+    # lines (e.g. different variants), so stock is checked against its total.
+    requested = Counter()
+    for item in order_data.items:
+        requested[str(item.product_id)] += item.quantity
     order_items = []
     subtotal = 0
     
     for item in order_data.items:
-        product = db.table("products").select("*").eq("id", str(item.product_id)).execute()
-        if not product.data:
+        prod = products_by_id.get(str(item.product_id))
+        if not prod:
             raise HTTPException(status_code=400, detail=f"Product {item.product_id} not found")
         
-        prod = product.data[0]
-        
         if not prod["is_published"]:
             raise HTTPException(status_code=400, detail=f"Product '{prod['name_vi']}' is not available")
         
         # Check stock
-        if prod["stock_quantity"] < item.quantity:
+        if prod["stock_quantity"] < requested[str(item.product_id)]:
             raise HTTPException(
                 status_code=400, 
                 detail=f"Insufficient stock for '{prod['name_vi']}'. Available: {prod['stock_quantity']}"
@@ -74,11 +208,10 @@ async def create_order(
         # Get variant if specified
         variant_name = None
         price_adjustment = 0
-        if item.variant_id:
-            variant = db.table("product_variants").select("*").eq("id", str(item.variant_id)).execute()
-            if variant.data:
-                variant_name = variant.data[0]["name_vi"]
-                price_adjustment = variant.data[0].get("price_adjustment", 0)
+        variant = variants_by_id.get(str(item.variant_id)) if item.variant_id else None
+        if variant:
+            variant_name = variant["name_vi"]
+            price_adjustment = variant.get("price_adjustment", 0)
         
         unit_price = (prod.get("sale_price") or prod["price"]) + price_adjustment
         total_price = unit_price * item.quantity
@@ -98,77 +231,58 @@ async def create_order(
     # Calculate delivery fee
     shipping_fee = calculate_delivery_fee(order_data.shipping_address.district)
     
-    # Apply discount code if provided
-    discount_amount = 0
-    if order_data.discount_code:
-        discount = db.table("discount_codes").select("*").eq("code", order_data.discount_code.upper()).eq("is_active", True).execute()
-        if discount.data:
-            d = discount.data[0]
-            # Check validity
-            now = datetime.utcnow()
-            if d.get("starts_at") and datetime.fromisoformat(d["starts_at"].replace("Z", "+00:00")) > now:
-                pass  # Not started yet
-            elif d.get("expires_at") and datetime.fromisoformat(d["expires_at"].replace("Z", "+00:00")) < now:
-                pass  # Expired
-            elif d.get("max_uses") and d.get("used_count", 0) >= d["max_uses"]:
-                pass  # Max uses reached
-            elif d.get("min_order_value") and subtotal < d["min_order_value"]:
-                pass  # Min order not met
-            else:
-                # Apply discount
-                if d["discount_type"] == "percentage":
-                    discount_amount = int(subtotal * d["discount_value"] / 100)
-                else:
-                    discount_amount = int(d["discount_value"])
-                
-                # Increment used count
-                db.table("discount_codes").update({"used_count": d.get("used_count", 0) + 1}).eq("id", d["id"]).execute()
-    
-    total = subtotal + shipping_fee - discount_amount
-    
-    # Create order
-    order_number = generate_order_number()
-    order = {
-        "order_number": order_number,
-        "shipping_address": order_data.shipping_address.model_dump(),
-        "shipping_fee": shipping_fee,
-        "subtotal": subtotal,
-        "discount_amount": discount_amount,
-        "total": total,
-        "payment_method": order_data.payment_method,
-        "customer_note": order_data.customer_note,
-        "delivery_date": order_data.delivery_date,
-        "delivery_time_slot": order_data.delivery_time_slot,
-        "order_status": "pending",
-        "payment_status": "pending"
-    }
+    # Discount code, if provided, is priced in the loop below
+    code = order_data.discount_code.strip().upper() if order_data.discount_code else None
     
-    result = db.table("orders").insert(order).execute()
+    # One transaction takes the stock (conditionally, so racing checkouts
+    # can't oversell), uses the discount and inserts the order and its items.
+    # The stock check above only gives an early, descriptive error; likewise
+    # discount_for() only prices the code, and the UPDATE that takes a use
+    # re-validates it against the live row. If that refuses a code priced
+    # from a stale cached row, re-read it and try once more.
+    for attempt in range(2):
+        discount_amount, discount_id = _price_discount(db, code, subtotal)
+        total = subtotal + shipping_fee - discount_amount
+        
+        # order_number is assigned by the column default
+        order = {
+            "shipping_address": order_data.shipping_address.model_dump(),
+            "shipping_fee": shipping_fee,
+            "subtotal": subtotal,
+            "discount_amount": discount_amount,
+            "total": total,
+            "payment_method": order_data.payment_method,
+            "customer_note": order_data.customer_note,
+            "delivery_date": order_data.delivery_date,
+            "delivery_time_slot": order_data.delivery_time_slot,
+            "order_status": "pending",
+            "payment_status": "pending"
+        }
+        
+        try:
+            result = db.rpc("place_order", {
+                "p_order": order,
+                "p_items": order_items,
+                "p_discount_id": discount_id
+            }).execute()
+            break
+        except Exception as e:
+            sqlstate, message = _db_error(e)
+            if sqlstate != CONFLICT_SQLSTATE:
+                raise
+            if discount_id and message == DISCOUNT_UNAVAILABLE:
+                invalidate_discount(code)
+                if attempt == 0:
+                    continue
+            raise HTTPException(status_code=409, detail=message or "Order could not be placed")
     if not result.data:
         raise HTTPException(status_code=500, detail="Failed to create order")
     
-    order_id = result.data[0]["id"]
-    
-    # Create order items
-    created_items = []
-    for item in order_items:
-        item["order_id"] = order_id
-        item_result = db.table("order_items").insert(item).execute()
-        if item_result.data:
-            created_items.append(item_result.data[0])
-            
-    # Reduce stock
-    for item in order_data.items:
-        prod = db.table("products").select("stock_quantity").eq("id", str(item.product_id)).execute()
-        if prod.data:
-            new_qty = prod.data[0]["stock_quantity"] - item.quantity
-            db.table("products").update({"stock_quantity": new_qty}).eq("id", str(item.product_id)).execute()
-    
-    # Return order with items
-    order_response = result.data[0]
-    order_response["items"] = created_items
+    if discount_id:
+        # The cached copy's used_count is now stale
+        invalidate_discount(code)
     
-    return order_response
+    return result.data[0]["order_with_items"]
 
 
 @router.get("/{order_number}", response_model=OrderResponse)
@@ -177,15 +291,11 @@ async def get_order_by_number(
     db: Client = Depends(get_supabase_admin)
 ):
     """Get order by order number (for order tracking)."""
-    order = db.table("orders").select("*").eq("order_number", order_number).execute()
+    order = db.table("orders").select(ORDER_WITH_ITEMS).eq("order_number", order_number).execute()
     if not order.data:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    items = db.table("order_items").select("*").eq("order_id", order.data[0]["id"]).execute()
-    
-    order_data = order.data[0]
-    order_data["items"] = items.data
-    return order_data
+    return order.data[0]
 
 
 @router.post("/{order_id}/payment/stripe")
@@ -194,13 +304,10 @@ async def create_stripe_checkout(
     db: Client = Depends(get_supabase_admin)
 ):
     """Create Stripe checkout session for an order."""
-    import stripe
-    stripe.api_key = settings.stripe_secret_key
-    
-    if not stripe.api_key:
+    if not settings.stripe_secret_key:
         raise HTTPException(status_code=500, detail="Stripe not configured")
     
-    order = db.table("orders").select("*").eq("id", str(order_id)).execute()
+    order = db.table("orders").select("id, order_number, total").eq("id", str(order_id)).execute()
     if not order.data:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -237,24 +344,52 @@ async def create_stripe_checkout(
 
 @router.post("/webhook/stripe")
 async def stripe_webhook(
-    # In production, validate webhook signature
-    payload: dict,
+    request: Request,
     db: Client = Depends(get_supabase_admin)
 ):
-    """Handle Stripe webhook events."""
-    event_type = payload.get("type")
+    """
+    Handle Stripe webhook events.
+    Events are only accepted with a valid, recent Stripe-Signature, so
+    STRIPE_WEBHOOK_SECRET must be configured.
+    """
+    if not settings.stripe_webhook_secret:
+        raise HTTPException(status_code=503, detail="Stripe webhook not configured")
+    
+    body = await request.body()
+    try:
+        # The tolerance also rejects a captured request replayed later
+        stripe.WebhookSignature.verify_header(
+            body,
+            request.headers.get("stripe-signature"),
+            settings.stripe_webhook_secret,
+            tolerance=stripe.Webhook.DEFAULT_TOLERANCE,
+        )
+    except (stripe.error.SignatureVerificationError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid signature")
+    
+    try:
+        event = _STRIPE_EVENT.validate_json(body)
+    except ValidationError:
+        raise HTTPException(status_code=400, detail="Invalid payload")
     
-    if event_type == "checkout.session.completed":
-        session = payload.get("data", {}).get("object", {})
-        order_id = session.get("metadata", {}).get("order_id")
+    # Stripe redelivers events; skip the ones this process already handled
+    if event.id and event.id in _SEEN_EVENTS:
+        return {"received": True}
+    
+    if event.type == "checkout.session.completed":
+        session = event.data.get("object") or {}
+        order_id = (session.get("metadata") or {}).get("order_id")
         
         if order_id:
+            # Only a pending order moves to paid, so a redelivery is a no-op
             db.table("orders").update({
                 "payment_status": "paid",
                 "order_status": "confirmed",
                 "paid_at": datetime.utcnow().isoformat()
-            }).eq("id", order_id).execute()
+            }).eq("id", order_id).eq("payment_status", "pending").execute()
     
+    if event.id:
+        _SEEN_EVENTS[event.id] = True
     return {"received": True}
 
 
@@ -271,13 +406,11 @@ async def capture_paypal_order(
     if not settings.paypal_client_id or not settings.paypal_client_secret:
         raise HTTPException(status_code=500, detail="PayPal not configured")
     
-    # Get Order
-    order = db.table("orders").select("*").eq("id", str(order_id)).execute()
+    # Get Order (only its existence is checked)
+    order = db.table("orders").select("id").eq("id", str(order_id)).execute()
     if not order.data:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    order_data = order.data[0]
-    
     # PayPal API URL
     base_url = "https://api-m.sandbox.paypal.com" if settings.paypal_mode == "sandbox" else "https://api-m.paypal.com"
     
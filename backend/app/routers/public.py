@@ -2,22 +2,43 @@
 Public API routes for the storefront.
 These endpoints are accessible without authentication.
 """
+import re
+from datetime import datetime
+from functools import lru_cache
 from fastapi import APIRouter, Depends, HTTPException, Query
 from uuid import UUID
 from typing import Optional
 from supabase import Client
 
-from app.database import get_supabase
+from app.core.pagination import next_cursor, seek
+from app.database import get_pg_pool, get_supabase
+from app.services import catalog_cache
+from app.services.view_counter import ViewCounter
 from app.schemas.schemas import (
     CategoryResponse,
     ProductResponse,
     BlogPostResponse,
     SocialFeedResponse,
-    PaginatedResponse
+    PaginatedResponse,
+    cursor_page,
+    paginated,
 )
 
 router = APIRouter(tags=["Public"])
 
+# Storefront product fields (ProductResponse). Not "*": products also carry a
+# 1536-dim embedding and the search_tsv tsvector, which list/search items
+# (untyped) would otherwise ship to the browser
+PRODUCT_COLUMNS = (
+    "id,sku,slug,name_vi,name_en,description_vi,description_en,short_description_vi,"
+    "short_description_en,price,sale_price,cost_price,category_id,images,tags,"
+    "stock_quantity,is_featured,is_published,seo_title,seo_description,"
+    "fb_post_id,fb_synced_at,created_at,updated_at"
+)
+_PRODUCT_COLUMNS_SQL = PRODUCT_COLUMNS.replace(",", ", ")
+
+blog_views = ViewCounter()
+
 
 # =====================================================
 # CATEGORIES
@@ -27,8 +48,10 @@ async def list_categories(
     db: Client = Depends(get_supabase)
 ):
     """List all active categories."""
-    result = db.table("categories").select("*").eq("is_active", True).order("sort_order").execute()
-    return result.data
+    return await catalog_cache.get_categories(
+        ("public",),
+        lambda: db.table("categories").select("*").eq("is_active", True).order("sort_order").execute().data,
+    )
 
 
 @router.get("/categories/{slug}", response_model=CategoryResponse)
@@ -46,6 +69,82 @@ async def get_category_by_slug(
 # =====================================================
 # PRODUCTS
 # =====================================================
+_PRODUCT_SORTS = {
+    "newest": "created_at DESC, id DESC",
+    "price_asc": "price ASC, id ASC",
+    "price_desc": "price DESC, id DESC",
+    "popular": "created_at DESC, id DESC",
+}
+
+
+@lru_cache(maxsize=None)
+def _product_list_sql(
+    sort: str, by_category: bool, featured_only: bool, has_min: bool, has_max: bool
+) -> tuple[str, str]:
+    """
+    (page query, count query) for one combination of /products filters.
+    Only active filters appear in the SQL, so each combination is its own
+    prepared statement and even its generic plan can use the
+    (is_published, category_id, ...) indexes; "$n IS NULL OR ..." can't.
+    """
+    clauses, n = ["is_published = $1"], 1
+    for condition, active in (
+        ("category_id = ${}", by_category),
+        ("price >= ${}", has_min),
+        ("price <= ${}", has_max),
+    ):
+        if active:
+            n += 1
+            clauses.append(condition.format(n))
+    if featured_only:
+        clauses.append("is_featured")
+    where = " AND ".join(clauses)
+    return (
+        f"SELECT {_PRODUCT_COLUMNS_SQL}, count(*) OVER () AS total_count FROM products WHERE {where} "
+        f"ORDER BY {_PRODUCT_SORTS[sort]} LIMIT ${n + 1} OFFSET ${n + 2}",
+        f"SELECT count(*) FROM products WHERE {where}",
+    )
+
+
+async def _resolve_category_id(db: Client, pg, slug: str):
+    """Category id for slug (cached), or None if no such category."""
+    async def load():
+        if pg is not None:
+            return await pg.fetchval("SELECT id FROM categories WHERE slug = $1", slug)
+        result = db.table("categories").select("id").eq("slug", slug).execute()
+        return result.data[0]["id"] if result.data else None
+    return await catalog_cache.get_category_id(slug, load)
+
+
+async def _fetch_page(pg, list_sql: str, count_sql: str, args: list, limit: int, offset: int) -> tuple[list, int]:
+    """
+    Run a page query that selects count(*) OVER () AS total_count and takes
+    LIMIT/OFFSET as its last two params. One round trip for the page and its
+    total; a page past the end falls back to count_sql.
+    """
+    records = await pg.fetch(list_sql, *args, limit, offset)
+    if not records:
+        total = await pg.fetchval(count_sql, *args) if offset else 0
+        return [], total
+    total = records[0]["total_count"]
+    rows = [dict(r) for r in records]
+    for row in rows:
+        del row["total_count"]
+    return rows, total
+
+
+async def _list_products_pg(
+    pg, sort: str, offset: int, limit: int, is_published: bool,
+    category_id, featured_only: bool, min_price: Optional[int], max_price: Optional[int],
+) -> tuple[list, int]:
+    """A /products page and its total from the asyncpg pool."""
+    list_sql, count_sql = _product_list_sql(
+        sort, category_id is not None, featured_only, min_price is not None, max_price is not None
+    )
+    args = [is_published, *(v for v in (category_id, min_price, max_price) if v is not None)]
+    return await _fetch_page(pg, list_sql, count_sql, args, limit, offset)
+
+
 @router.get("/products", response_model=PaginatedResponse)
 async def list_products(
     page: int = Query(1, ge=1),
@@ -56,10 +155,29 @@ async def list_products(
     min_price: Optional[int] = None,
     max_price: Optional[int] = None,
     sort: str = Query("newest", regex="^(newest|price_asc|price_desc|popular)$"),
-    db: Client = Depends(get_supabase)
+    db: Client = Depends(get_supabase),
+    pg = Depends(get_pg_pool)
 ):
     """List published products with filtering."""
-    query = db.table("products").select("*", count="exact")
+    offset = (page - 1) * page_size
+    # Unknown category slugs are ignored
+    category_id = await _resolve_category_id(db, pg, category) if category else None
+    
+    if pg is not None:
+        items, total = await _list_products_pg(
+            pg, sort, offset, page_size,
+            True if is_published is None else is_published,
+            category_id, bool(is_featured), min_price or None, max_price or None,
+        )
+        return PaginatedResponse(
+            items=items,
+            total=total,
+            page=page,
+            page_size=page_size,
+            total_pages=(total + page_size - 1) // page_size
+        )
+    
+    query = db.table("products").select(PRODUCT_COLUMNS, count="exact")
     
     # Only filter by is_published if explicitly set
     if is_published is not None:
@@ -68,11 +186,8 @@ async def list_products(
         # Default to showing only published products
         query = query.eq("is_published", True)
     
-    # Category filter (by slug)
-    if category:
-        cat = db.table("categories").select("id").eq("slug", category).execute()
-        if cat.data:
-            query = query.eq("category_id", cat.data[0]["id"])
+    if category_id:
+        query = query.eq("category_id", category_id)
     
     if is_featured:
         query = query.eq("is_featured", True)
@@ -85,14 +200,13 @@ async def list_products(
     if sort == "newest":
         query = query.order("created_at", desc=True)
     elif sort == "price_asc":
-        query = query.order("price", desc=False)
+        query = query.order("price", desc=False).order("id", desc=False)
     elif sort == "price_desc":
-        query = query.order("price", desc=True)
+        query = query.order("price", desc=True).order("id", desc=True)
     else:
         query = query.order("created_at", desc=True)
     
     # Pagination
-    offset = (page - 1) * page_size
     query = query.range(offset, offset + page_size - 1)
     
     result = query.execute()
@@ -110,32 +224,61 @@ async def list_products(
 @router.get("/products/featured", response_model=list[ProductResponse])
 async def get_featured_products(
     limit: int = Query(8, ge=1, le=20),
-    db: Client = Depends(get_supabase)
+    db: Client = Depends(get_supabase),
+    pg = Depends(get_pg_pool)
 ):
     """Get featured products for homepage."""
-    result = db.table("products").select("*").eq("is_published", True).eq("is_featured", True).limit(limit).execute()
+    if pg is not None:
+        records = await pg.fetch(
+            f"SELECT {_PRODUCT_COLUMNS_SQL} FROM products WHERE is_published AND is_featured LIMIT $1", limit
+        )
+        return [dict(r) for r in records]
+    result = db.table("products").select(PRODUCT_COLUMNS).eq("is_published", True).eq("is_featured", True).limit(limit).execute()
     return result.data
 
 
+_PRODUCT_BY_SLUG_SQL = f"SELECT {_PRODUCT_COLUMNS_SQL} FROM products WHERE slug = $1 AND is_published"
+
+
 @router.get("/products/{slug}", response_model=ProductResponse)
 async def get_product_by_slug(
     slug: str,
-    db: Client = Depends(get_supabase)
+    db: Client = Depends(get_supabase),
+    pg = Depends(get_pg_pool)
 ):
     """Get product by slug."""
-    result = db.table("products").select("*").eq("slug", slug).eq("is_published", True).execute()
-    if not result.data:
+    if pg is not None:
+        row = await pg.fetchrow(_PRODUCT_BY_SLUG_SQL, slug)
+        rows = [dict(row)] if row else []
+    else:
+        rows = db.table("products").select(PRODUCT_COLUMNS).eq("slug", slug).eq("is_published", True).execute().data
+    if not rows:
         raise HTTPException(status_code=404, detail="Product not found")
-    return result.data[0]
+    return rows[0]
+
+
+_RELATED_PRODUCTS_SQL = f"""
+SELECT {", ".join("p." + c for c in PRODUCT_COLUMNS.split(","))}
+FROM products src
+JOIN products p ON p.category_id = src.category_id AND p.id <> src.id
+WHERE src.slug = $1 AND p.is_published
+LIMIT $2
+"""
 
 
 @router.get("/products/{slug}/related", response_model=list[ProductResponse])
 async def get_related_products(
     slug: str,
     limit: int = Query(4, ge=1, le=10),
-    db: Client = Depends(get_supabase)
+    db: Client = Depends(get_supabase),
+    pg = Depends(get_pg_pool)
 ):
     """Get related products based on category."""
+    if pg is not None:
+        # The related query needs the product's category, so resolve both in one statement
+        records = await pg.fetch(_RELATED_PRODUCTS_SQL, slug, limit)
+        return [dict(r) for r in records]
+    
     # First get the product
     product = db.table("products").select("id,category_id").eq("slug", slug).execute()
     if not product.data:
@@ -148,7 +291,7 @@ async def get_related_products(
         return []
     
     # Get related products from same category
-    result = db.table("products").select("*").eq("is_published", True).eq("category_id", category_id).neq("id", product_id).limit(limit).execute()
+    result = db.table("products").select(PRODUCT_COLUMNS).eq("is_published", True).eq("category_id", category_id).neq("id", product_id).limit(limit).execute()
     return result.data
 
 
@@ -195,8 +338,8 @@ async def get_blog_post_by_slug(
     
     post = result.data[0]
     
-    # Increment view count
-    db.table("blog_posts").update({"view_count": post["view_count"] + 1}).eq("id", post["id"]).execute()
+    # Counted in memory and added to view_count in periodic batches
+    await blog_views.record(post["id"])
     
     return post
 
@@ -204,19 +347,48 @@ async def get_blog_post_by_slug(
 # =====================================================
 # SEARCH
 # =====================================================
+# Same match as the PostgREST filter below. The name ILIKEs use the trigram
+# indexes (008) and tags @> the GIN index (017), so the OR is a BitmapOr
+# instead of a sequential scan.
+_SEARCH_FILTER_SQL = (
+    "FROM products WHERE is_published "
+    "AND (name_vi ILIKE $1 OR name_en ILIKE $1 OR tags @> ARRAY[$2::text])"
+)
+_SEARCH_SQL = (
+    f"SELECT {_PRODUCT_COLUMNS_SQL}, count(*) OVER () AS total_count {_SEARCH_FILTER_SQL} "
+    "ORDER BY created_at DESC, id DESC LIMIT $3 OFFSET $4"
+)
+_SEARCH_COUNT_SQL = f"SELECT count(*) {_SEARCH_FILTER_SQL}"
+_LIKE_ESCAPE_RE = re.compile(r"[\\%_]")
+
+
 @router.get("/search", response_model=PaginatedResponse)
 async def search(
     q: str = Query(..., min_length=2),
     page: int = Query(1, ge=1),
     page_size: int = Query(12, ge=1, le=50),
-    db: Client = Depends(get_supabase)
+    db: Client = Depends(get_supabase),
+    pg = Depends(get_pg_pool)
 ):
     """Search products by name."""
-    query = db.table("products").select("*", count="exact").eq("is_published", True).or_(
+    offset = (page - 1) * page_size
+    
+    if pg is not None:
+        pattern = "%" + _LIKE_ESCAPE_RE.sub(r"\\\g<0>", q) + "%"
+        items, total = await _fetch_page(
+            pg, _SEARCH_SQL, _SEARCH_COUNT_SQL, [pattern, q], page_size, offset
+        )
+        return PaginatedResponse(
+            items=items,
+            total=total,
+            page=page,
+            page_size=page_size,
+            total_pages=(total + page_size - 1) // page_size
+        )
+    
+    query = db.table("products").select(PRODUCT_COLUMNS, count="exact").eq("is_published", True).or_(
         f"name_vi.ilike.%{q}%,name_en.ilike.%{q}%,tags.cs.{{{q}}}"
     )
-    
-    offset = (page - 1) * page_size
     query = query.range(offset, offset + page_size - 1)
     
     result = query.execute()
@@ -234,17 +406,22 @@ async def search(
 # =====================================================
 # SOCIAL FEED
 # =====================================================
-@router.get("/social/feed", response_model=PaginatedResponse)
+@router.get("/social/feed")
 async def get_social_feed(
     page: int = Query(1, ge=1),
     page_size: int = Query(12, ge=1, le=50),
     platform: Optional[str] = None,
     year: Optional[int] = None,
     month: Optional[int] = Query(None, ge=1, le=12),
+    cursor: Optional[str] = None,
     db: Client = Depends(get_supabase)
 ):
-    """Get social feed items (Facebook/Instagram) with pagination and date filtering."""
-    query = db.table("social_feed").select("*", count="exact")
+    """
+    Get social feed items (Facebook/Instagram) with pagination and date filtering.
+    Pass next_cursor back as cursor to page by (posted_at, id) without an
+    offset scan or a COUNT.
+    """
+    query = db.table("social_feed").select("*", count=None if cursor else "exact")
     
     if platform:
         query = query.eq("platform", platform)
@@ -252,7 +429,6 @@ async def get_social_feed(
     # Date filtering by year and month
     if year and month:
         # Filter posts within the specified month
-        from datetime import datetime
         start_date = datetime(year, month, 1).isoformat()
         if month == 12:
             end_date = datetime(year + 1, 1, 1).isoformat()
@@ -261,23 +437,23 @@ async def get_social_feed(
         query = query.gte("posted_at", start_date).lt("posted_at", end_date)
     elif year:
         # Filter posts within the specified year
-        from datetime import datetime
         start_date = datetime(year, 1, 1).isoformat()
         end_date = datetime(year + 1, 1, 1).isoformat()
         query = query.gte("posted_at", start_date).lt("posted_at", end_date)
         
-    offset = (page - 1) * page_size
-    query = query.order("posted_at", desc=True).range(offset, offset + page_size - 1)
+    query = seek(query, "posted_at", cursor)
+    if cursor:
+        rows = query.limit(page_size + 1).execute().data
+        return cursor_page(rows[:page_size], page_size, next_cursor(rows, page_size, "posted_at"))
     
-    result = query.execute()
-    total = result.count or 0
+    # One look-ahead row tells whether a next page (and its cursor) exists
+    offset = (page - 1) * page_size
+    result = query.range(offset, offset + page_size).execute()
+    rows = result.data
     
-    return PaginatedResponse(
-        items=result.data,
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=(total + page_size - 1) // page_size
+    return paginated(
+        rows[:page_size], result.count or 0, page, page_size,
+        next_cursor(rows, page_size, "posted_at"),
     )
 
 
@@ -2,6 +2,7 @@
 File upload router for images.
 Stores files locally in backend/uploads directory.
 """
+import asyncio
 import os
 import uuid
 from datetime import datetime
@@ -17,6 +18,26 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 # Allowed image types
 ALLOWED_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
 MAX_SIZE = 5 * 1024 * 1024  # 5MB
+CHUNK_SIZE = 64 * 1024
+
+
+def _save_upload(src, filepath: str) -> int | None:
+    """
+    Copy src to filepath CHUNK_SIZE bytes at a time, so an upload never sits
+    in memory whole. Returns the size, or None (and removes the partial
+    file) once it exceeds MAX_SIZE.
+    """
+    size = 0
+    with open(filepath, "wb") as dst:
+        while chunk := src.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_SIZE:
+                break
+            dst.write(chunk)
+        else:
+            return size
+    os.remove(filepath)
+    return None
 
 
 @router.post("/image")
@@ -32,26 +53,22 @@ async def upload_image(file: UploadFile = File(...)):
             detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_TYPES)}"
         )
     
-    # Read file content
-    content = await file.read()
-    
-    # Validate file size
-    if len(content) > MAX_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Maximum size: {MAX_SIZE // 1024 // 1024}MB"
-        )
-    
     # Generate unique filename
     ext = file.filename.split(".")[-1] if "." in file.filename else "jpg"
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     unique_id = uuid.uuid4().hex[:8]
     filename = f"{timestamp}_{unique_id}.{ext}"
     
-    # Save file
+    # Save file, streamed in chunks off the event loop
     filepath = os.path.join(UPLOAD_DIR, filename)
-    with open(filepath, "wb") as f:
-        f.write(content)
+    size = await asyncio.to_thread(_save_upload, file.file, filepath)
+    
+    # Validate file size
+    if size is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large. Maximum size: {MAX_SIZE // 1024 // 1024}MB"
+        )
     
     # Return URL path (relative to API base)
     url = f"/uploads/{filename}"
@@ -59,7 +76,7 @@ async def upload_image(file: UploadFile = File(...)):
     return JSONResponse({
         "url": url,
         "filename": filename,
-        "size": len(content),
+        "size": size,
         "content_type": file.content_type
     })
 
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import Optional
 from datetime import datetime
 from uuid import UUID
@@ -40,8 +40,7 @@ class CategoryResponse(CategoryBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # =====================================================
@@ -115,8 +114,7 @@ class ProductResponse(ProductBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # =====================================================
@@ -177,8 +175,7 @@ class OrderResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class OrderStatusUpdate(BaseModel):
@@ -187,6 +184,16 @@ class OrderStatusUpdate(BaseModel):
     admin_note: Optional[str] = None
 
 
+# =====================================================
+# Payment Schemas
+# =====================================================
+class StripeEvent(BaseModel):
+    """The parts of a Stripe webhook event the API reads; other fields are ignored."""
+    id: Optional[str] = None
+    type: str
+    data: dict = Field(default_factory=dict)
+
+
 # =====================================================
 # Blog Schemas
 # =====================================================
@@ -232,8 +239,7 @@ class BlogPostResponse(BlogPostBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # =====================================================
@@ -254,8 +260,7 @@ class SocialFeedResponse(BaseModel):
     imported_product_id: Optional[UUID]
     is_pinned: bool = False
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ImportAsProductRequest(BaseModel):
@@ -272,9 +277,13 @@ class BulkImportItem(BaseModel):
     price: Optional[int] = 0  # Optional, defaults to 0
 
 
+# One request is one products insert; larger imports must be split by the client
+MAX_BULK_IMPORT_ITEMS = 500
+
+
 class BulkImportAsProductRequest(BaseModel):
     category_id: UUID  # Required for bulk import
-    items: list[BulkImportItem]
+    items: list[BulkImportItem] = Field(..., max_length=MAX_BULK_IMPORT_ITEMS)
 
 
 class SocialSyncRequest(BaseModel):
@@ -294,3 +303,22 @@ class PaginatedResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+
+
+def paginated(
+    items: list, total: int, page: int, page_size: int, next_cursor: Optional[str] = None
+) -> dict:
+    """Plain-dict PaginatedResponse for hot list endpoints (skips model validation)."""
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": (total + page_size - 1) // page_size,
+        "next_cursor": next_cursor,
+    }
+
+
+def cursor_page(items: list, page_size: int, next_cursor: Optional[str]) -> dict:
+    """Keyset page: no total (that needs a COUNT), just the cursor for the next page."""
+    return {"items": items, "page_size": page_size, "next_cursor": next_cursor}
@@ -0,0 +1,78 @@
+"""
+Catalog Cache - short-lived cache for rarely changing catalog data.
+In-process TTL cache first, then the shared Redis cache (if configured).
+"""
+import hashlib
+from typing import Any, Awaitable, Callable
+
+import orjson
+from cachetools import TTLCache
+
+from app.services import shared_cache
+
+# Categories change rarely but are read on every storefront/admin page load
+CATEGORIES_TTL_SECONDS = 30
+# Admin product list pages (filters/search + page), shared across workers
+PRODUCT_LIST_TTL_SECONDS = 30
+# Category slug -> id, used by every /products?category= request
+CATEGORY_ID_TTL_SECONDS = 300
+
+_categories: TTLCache = TTLCache(maxsize=8, ttl=CATEGORIES_TTL_SECONDS)
+_category_ids: TTLCache = TTLCache(maxsize=256, ttl=CATEGORY_ID_TTL_SECONDS)
+
+
+async def get_categories(key: tuple, loader: Callable[[], Any]) -> Any:
+    """Return cached categories for key, calling loader() on a miss."""
+    try:
+        return _categories[key]
+    except KeyError:
+        redis_key = "categories:" + ":".join(map(str, key))
+        value = await shared_cache.get_or_load(redis_key, CATEGORIES_TTL_SECONDS, loader)
+        _categories[key] = value
+        return value
+
+
+async def get_category_id(slug: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Return the cached id for a category slug, awaiting loader() on a miss.
+    Unknown slugs aren't cached, so a new category is visible immediately.
+    """
+    try:
+        return _category_ids[slug]
+    except KeyError:
+        category_id = await loader()
+        if category_id is not None:
+            _category_ids[slug] = category_id
+        return category_id
+
+
+def clear_local() -> None:
+    """Drop this process's cached category lists and slug ids."""
+    _categories.clear()
+    _category_ids.clear()
+
+
+async def invalidate_categories() -> None:
+    """Drop all cached category lists (call after any category write)."""
+    clear_local()
+    await shared_cache.invalidate("categories:*")
+
+
+async def get_product_list(params: dict, loader: Callable[[], Any]) -> Any:
+    """
+    Return a cached product list page for params, calling loader() on a miss.
+    The key hashes the products version, so any product write retires all pages.
+    """
+    version = await shared_cache.get_version("products")
+    fingerprint = hashlib.blake2b(
+        orjson.dumps([version, params], option=orjson.OPT_SORT_KEYS, default=str),
+        digest_size=16,
+    ).hexdigest()
+    return await shared_cache.get_or_load(
+        f"products:list:{fingerprint}", PRODUCT_LIST_TTL_SECONDS, loader
+    )
+
+
+async def invalidate_products() -> None:
+    """Retire all cached product list pages (call after any product write)."""
+    await shared_cache.bump_version("products")
@@ -3,14 +3,29 @@ Facebook Graph API integration service.
 Fetches posts and photos from the Yenflowers Facebook Page.
 Supports batch-based sync with cursor persistence for resumable syncing.
 """
+import time
 import httpx
 from datetime import datetime
-from typing import Optional, Dict, Any, Tuple
+from functools import lru_cache
+from typing import AsyncIterator, Optional, Dict, Any, Tuple
 from app.config import get_settings
 
 settings = get_settings()
 
 FB_GRAPH_URL = "https://graph.facebook.com/v19.0"
+POST_FIELDS = "id,created_time,message,full_picture,permalink_url,attachments{media_type,media,subattachments{media_type,media}}"
+
+
+@lru_cache(maxsize=None)
+def _graph_http_client() -> httpx.Client:
+    """
+    One keep-alive pool per process for Graph API calls, so paging through
+    the feed reuses the TLS connection instead of handshaking per page.
+    """
+    return httpx.Client(
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+    )
 
 
 class FacebookSyncService:
@@ -33,10 +48,9 @@ class FacebookSyncService:
         if params:
             default_params.update(params)
         
-        with httpx.Client(timeout=30.0) as client:
-            response = client.get(url, params=default_params)
-            response.raise_for_status()
-            return response.json()
+        response = _graph_http_client().get(url, params=default_params)
+        response.raise_for_status()
+        return response.json()
     
     def get_total_posts_count(self) -> int:
         """
@@ -74,7 +88,8 @@ class FacebookSyncService:
         self, 
         batch_size: int = 25, 
         cursor: Optional[str] = None,
-        days_back: Optional[int] = None
+        days_back: Optional[int] = None,
+        since: Optional[int] = None
     ) -> Tuple[list[Dict[str, Any]], Optional[str], bool]:
         """
         Fetch a single batch of posts.
@@ -83,6 +98,7 @@ class FacebookSyncService:
             batch_size: Number of posts per batch (max 100)
             cursor: Pagination cursor from previous batch (None for first batch)
             days_back: Optional filter for posts from last N days
+            since: Optional unix timestamp; only posts created after it (wins over days_back)
         
         Returns:
             Tuple of (posts_list, next_cursor, has_more)
@@ -91,13 +107,14 @@ class FacebookSyncService:
             raise ValueError("Facebook Page ID not configured")
         
         params = {
-            "fields": "id,created_time,message,full_picture,permalink_url,attachments{media_type,media,subattachments{media_type,media}}",
+            "fields": POST_FIELDS,
             "limit": min(batch_size, 100)
         }
         
         # Add since filter if specified
-        if days_back:
-            import time
+        if since:
+            params["since"] = str(int(since))
+        elif days_back:
             since_timestamp = int(time.time()) - (days_back * 86400)
             params["since"] = str(since_timestamp)
         
@@ -118,6 +135,44 @@ class FacebookSyncService:
         
         return posts, next_cursor, has_more
     
+    async def iter_posts(
+        self,
+        batch_size: int = 25,
+        since: Optional[int] = None
+    ) -> AsyncIterator[list[Dict[str, Any]]]:
+        """
+        Yield the page's posts one Graph API page at a time, following the
+        paging cursor over a single async keep-alive connection. The next
+        page is only requested when the caller asks for it, so the caller's
+        own I/O (e.g. database writes) can run while it is in flight.
+        """
+        if not self.page_id:
+            raise ValueError("Facebook Page ID not configured")
+        if not self.access_token:
+            raise ValueError("Facebook access token not configured")
+        
+        params = {
+            "access_token": self.access_token,
+            "fields": POST_FIELDS,
+            "limit": min(batch_size, 100),
+        }
+        if since:
+            params["since"] = str(int(since))
+        
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            while True:
+                response = await client.get(f"{FB_GRAPH_URL}/{self.page_id}/feed", params=params)
+                response.raise_for_status()
+                data = response.json()
+                
+                yield self._parse_posts_with_images(data.get("data", []))
+                
+                paging = data.get("paging", {})
+                cursor = paging.get("cursors", {}).get("after")
+                if "next" not in paging or cursor is None:
+                    break
+                params["after"] = cursor
+    
     def fetch_page_photos(self, limit: int = 100, days_back: int = None) -> list[dict]:
         """
         Fetch photos from the page (standalone photos).
@@ -132,7 +187,6 @@ class FacebookSyncService:
         }
         
         if days_back:
-            import time
             since_timestamp = int(time.time()) - (days_back * 86400)
             params["since"] = str(since_timestamp)
         
@@ -1,6 +1,7 @@
 """
 User Interaction Tracking Service
 """
+import asyncio
 from typing import Optional, Dict, Any
 from datetime import datetime
 from app.database import get_db_client
@@ -8,13 +9,21 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Queued events are written in batches of up to BATCH_SIZE rows, at least
+# every FLUSH_INTERVAL_SECONDS; past QUEUE_SIZE pending events new ones are dropped
+BATCH_SIZE = 500
+FLUSH_INTERVAL_SECONDS = 0.25
+QUEUE_SIZE = 10000
+
 
 class InteractionTracker:
     """Track user interactions for AI/ML training"""
-    
+
     def __init__(self):
         self.db = get_db_client()
-    
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+
     async def track_event(
         self,
         session_id: str,
@@ -26,7 +35,10 @@ class InteractionTracker:
     ):
         """
         Track a user interaction event
-        
+
+        While the flusher is running (see start()) the event is only queued;
+        otherwise it is inserted right away.
+
         Args:
             session_id: Unique session identifier
             event_type: Type of event ('view', 'add_to_cart', 'purchase', etc.)
@@ -35,16 +47,65 @@ class InteractionTracker:
             user_id: Optional user ID (for logged-in users)
             metadata: Optional additional data
         """
+        event = {
+            "session_id": session_id,
+            "event_type": event_type,
+            "product_id": product_id,
+            "category_id": category_id,
+            "user_id": user_id,
+            "metadata": metadata or {}
+        }
+
+        if self._queue is None:
+            await self._insert([event])
+            return
+
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Interaction queue full, dropping event")
+
+    async def _insert(self, events: list[dict]):
         try:
-            await self.db.table("user_interactions").insert({
-                "session_id": session_id,
-                "event_type": event_type,
-                "product_id": product_id,
-                "category_id": category_id,
-                "user_id": user_id,
-                "metadata": metadata or {}
-            }).execute()
-            
+            # The client is synchronous; keep the batch insert off the event loop
+            await asyncio.to_thread(
+                lambda: self.db.table("user_interactions").insert(events).execute()
+            )
         except Exception as e:
-            logger.error(f"Error tracking event: {e}")
+            logger.error(f"Error tracking {len(events)} event(s): {e}")
             # Don't raise - tracking failures shouldn't break user experience
+
+    def start(self):
+        """Queue events from now on and write them in batches (call from the app's event loop)."""
+        if self._flusher is None:
+            self._queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+            self._flusher = asyncio.create_task(self._flush_loop(self._queue))
+
+    async def stop(self):
+        """Stop queueing and wait until every queued event has been written."""
+        if self._flusher is None:
+            return
+        queue, self._queue = self._queue, None
+        await queue.put(None)  # sentinel: flush what's left and exit
+        await self._flusher
+        self._flusher = None
+
+    async def _flush_loop(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            event = await queue.get()
+            if event is None:
+                break
+            batch = [event]
+            deadline = loop.time() + FLUSH_INTERVAL_SECONDS
+            while len(batch) < BATCH_SIZE:
+                try:
+                    event = await asyncio.wait_for(queue.get(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+            await self._insert(batch)
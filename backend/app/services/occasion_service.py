@@ -74,6 +74,26 @@ class OccasionService:
             logger.error(f"Error fetching occasion: {e}")
             return None
     
+    async def get_user_occasion(
+        self,
+        occasion_id: str,
+        user_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """Get an occasion only if it belongs to the user (one query for fetch + ownership)"""
+        try:
+            result = await self.db.table("customer_occasions") \
+                .select("*") \
+                .eq("id", occasion_id) \
+                .eq("user_id", user_id) \
+                .limit(1) \
+                .execute()
+            
+            return result.data[0] if result.data else None
+            
+        except Exception as e:
+            logger.error(f"Error fetching occasion: {e}")
+            return None
+    
     async def update_occasion(
         self,
         occasion_id: str,
@@ -92,6 +112,29 @@ class OccasionService:
             logger.error(f"Error updating occasion: {e}")
             raise
     
+    async def update_occasion_if_owner(
+        self,
+        occasion_id: str,
+        user_id: str,
+        updates: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Update an occasion owned by the user in a single query.
+        Returns the updated row, or None if no such occasion belongs to the user.
+        """
+        try:
+            result = await self.db.table("customer_occasions") \
+                .update(updates) \
+                .eq("id", occasion_id) \
+                .eq("user_id", user_id) \
+                .execute()
+            
+            return result.data[0] if result.data else None
+            
+        except Exception as e:
+            logger.error(f"Error updating occasion: {e}")
+            raise
+    
     async def delete_occasion(self, occasion_id: str):
         """Delete an occasion"""
         try:
@@ -104,6 +147,24 @@ class OccasionService:
             logger.error(f"Error deleting occasion: {e}")
             raise
     
+    async def delete_occasion_if_owner(self, occasion_id: str, user_id: str) -> bool:
+        """
+        Delete an occasion owned by the user in a single query.
+        Returns False if no such occasion belongs to the user.
+        """
+        try:
+            result = await self.db.table("customer_occasions") \
+                .delete() \
+                .eq("id", occasion_id) \
+                .eq("user_id", user_id) \
+                .execute()
+            
+            return bool(result.data)
+            
+        except Exception as e:
+            logger.error(f"Error deleting occasion: {e}")
+            raise
+    
     async def get_upcoming_occasions_for_reminders(
         self,
         days_ahead: int = 7
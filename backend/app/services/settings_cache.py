@@ -0,0 +1,55 @@
+"""
+Settings Cache - in-process copy of the settings table.
+With REDIS_URL set, entries are keyed on the shared "settings" version
+counter, which every settings write bumps, so workers notice writes from
+other workers within VERSION_CHECK_SECONDS without reading the table.
+Without Redis the version stays 0: a write only clears the worker that
+made it, and other workers serve their copy for up to SETTINGS_TTL_SECONDS.
+"""
+import time
+from typing import Any, Callable
+
+from cachetools import TTLCache
+
+from app.services import shared_cache
+
+# How long a worker trusts its last read of the version counter
+VERSION_CHECK_SECONDS = 2.0
+
+_settings: TTLCache = TTLCache(maxsize=1, ttl=shared_cache.SETTINGS_TTL_SECONDS)
+_version = {"value": 0, "checked_at": float("-inf")}
+
+
+async def _current_version() -> int:
+    now = time.monotonic()
+    if now - _version["checked_at"] >= VERSION_CHECK_SECONDS:
+        _version["value"] = await shared_cache.get_version("settings")
+        _version["checked_at"] = now
+    return _version["value"]
+
+
+async def get_settings(loader: Callable[[], Any]) -> Any:
+    """Return all settings as a dict, calling loader() on a miss."""
+    version = await _current_version()
+    try:
+        return _settings[version]
+    except KeyError:
+        value = await shared_cache.get_or_load(
+            shared_cache.SETTINGS_KEY, shared_cache.SETTINGS_TTL_SECONDS, loader
+        )
+        _settings.clear()
+        _settings[version] = value
+        return value
+
+
+def clear_local() -> None:
+    """Drop this process's cached settings and version."""
+    _settings.clear()
+    _version["checked_at"] = float("-inf")
+
+
+async def invalidate_settings() -> None:
+    """Retire cached settings everywhere (call after any settings write)."""
+    clear_local()
+    await shared_cache.invalidate(shared_cache.SETTINGS_KEY)
+    await shared_cache.bump_version("settings")
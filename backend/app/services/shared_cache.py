@@ -0,0 +1,104 @@
+"""
+Shared Cache - optional Redis-backed JSON cache shared by all workers.
+Every call degrades to the loader when REDIS_URL is unset or Redis errors.
+"""
+import logging
+from typing import Any, Callable
+
+import orjson
+
+from app.core.responses import json_default
+from app.database import get_redis
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_KEY = "settings:all"
+SETTINGS_TTL_SECONDS = 60
+
+
+async def get_or_load(key: str, ttl: int, loader: Callable[[], Any]) -> Any:
+    """Return the cached JSON value for key, or call loader() and cache it for ttl seconds."""
+    redis = get_redis()
+    if redis is None:
+        return loader()
+    
+    try:
+        raw = await redis.get(key)
+        if raw is not None:
+            return orjson.loads(raw)
+    except Exception as e:
+        logger.warning(f"Redis get failed for {key}: {e}")
+        return loader()
+    
+    value = loader()
+    try:
+        await redis.setex(key, ttl, orjson.dumps(value, default=json_default))
+    except Exception as e:
+        logger.warning(f"Redis set failed for {key}: {e}")
+    return value
+
+
+async def set_json(key: str, value: Any, ttl: int) -> None:
+    """Store a JSON value for ttl seconds (no-op without Redis)."""
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.setex(key, ttl, orjson.dumps(value, default=json_default))
+    except Exception as e:
+        logger.warning(f"Redis set failed for {key}: {e}")
+
+
+async def get_json(key: str) -> Any:
+    """Read a JSON value, or None if missing or Redis is unavailable."""
+    redis = get_redis()
+    if redis is None:
+        return None
+    try:
+        raw = await redis.get(key)
+        return orjson.loads(raw) if raw is not None else None
+    except Exception as e:
+        logger.warning(f"Redis get failed for {key}: {e}")
+        return None
+
+
+async def invalidate(*keys: str) -> None:
+    """Delete cached keys; trailing '*' deletes by prefix."""
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        for key in keys:
+            if key.endswith("*"):
+                async for match in redis.scan_iter(match=key):
+                    await redis.delete(match)
+            else:
+                await redis.delete(key)
+    except Exception as e:
+        logger.warning(f"Redis invalidate failed for {keys}: {e}")
+
+
+async def get_version(name: str) -> int:
+    """Current value of a version counter (0 if unset or Redis is unavailable)."""
+    redis = get_redis()
+    if redis is None:
+        return 0
+    try:
+        return int(await redis.get(f"{name}:ver") or 0)
+    except Exception as e:
+        logger.warning(f"Redis get failed for {name}:ver: {e}")
+        return 0
+
+
+async def bump_version(name: str) -> None:
+    """
+    Increment a version counter. Keys built from the old version become
+    unreachable and expire on their own, so no key scan is needed.
+    """
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.incr(f"{name}:ver")
+    except Exception as e:
+        logger.warning(f"Redis incr failed for {name}:ver: {e}")
@@ -0,0 +1,77 @@
+"""
+Blog View Counter - coalesces view-count increments off the request path
+"""
+import asyncio
+import logging
+from collections import Counter
+from typing import Optional
+
+from app.database import get_supabase_admin
+
+logger = logging.getLogger(__name__)
+
+# Pending increments are written as one increment_blog_views() call
+# at least every FLUSH_INTERVAL_SECONDS
+FLUSH_INTERVAL_SECONDS = 5.0
+
+
+class ViewCounter:
+    """Count blog post views in memory and add them to view_count in batches"""
+
+    def __init__(self):
+        self._pending: Counter = Counter()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def record(self, post_id: str):
+        """
+        Count one view of post_id.
+
+        While the flusher is running (see start()) the view is only counted
+        in memory; otherwise it is written right away.
+        """
+        if self._flusher is None:
+            await self._write({str(post_id): 1})
+            return
+        self._pending[str(post_id)] += 1
+
+    async def flush(self):
+        """Write every pending increment in a single UPDATE."""
+        if not self._pending:
+            return
+        views, self._pending = dict(self._pending), Counter()
+        if not await self._write(views):
+            # Keep the views for the next flush rather than losing them
+            self._pending.update(views)
+
+    async def _write(self, views: dict[str, int]) -> bool:
+        db = get_supabase_admin()
+        try:
+            await asyncio.to_thread(
+                lambda: db.rpc("increment_blog_views", {"p_views": views}).execute()
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error writing views for {len(views)} post(s): {e}")
+            return False
+
+    def start(self):
+        """Batch views from now on (call from the app's event loop)."""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flusher and write whatever is still pending."""
+        if self._flusher is None:
+            return
+        flusher, self._flusher = self._flusher, None
+        flusher.cancel()
+        try:
+            await flusher
+        except asyncio.CancelledError:
+            pass
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+            await self.flush()
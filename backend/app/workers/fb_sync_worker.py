@@ -0,0 +1,126 @@
+"""
+Facebook Sync Worker - incremental Facebook sync outside the request path
+Started from POST /admin/social/sync/background, or run as a scheduled job (cron)
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import uuid4
+
+from cachetools import TTLCache
+
+from app.database import chunked, get_supabase_admin
+from app.services import settings_cache, shared_cache
+from app.services.facebook_sync import get_fb_service
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+JOB_TTL_SECONDS = 24 * 3600
+
+# Job status lives in Redis when configured (visible to every worker),
+# with this process's jobs also kept locally
+_jobs: TTLCache = TTLCache(maxsize=64, ttl=JOB_TTL_SECONDS)
+# Strong references so running tasks aren't garbage collected
+_tasks: set = set()
+
+
+async def _set_status(job_id: str, **status) -> None:
+    job = {**_jobs.get(job_id, {}), **status, "task_id": job_id}
+    _jobs[job_id] = job
+    await shared_cache.set_json(f"fbsync:job:{job_id}", job, JOB_TTL_SECONDS)
+
+
+async def get_job(job_id: str) -> Optional[dict]:
+    """Status of a sync job, or None if unknown/expired."""
+    return await shared_cache.get_json(f"fbsync:job:{job_id}") or _jobs.get(job_id)
+
+
+class FacebookSyncWorker:
+    """Fetches posts newer than the last completed sync and stores them"""
+
+    def __init__(self):
+        self.db = get_supabase_admin()
+        self.fb = get_fb_service()
+
+    async def sync(self, job_id: str) -> dict:
+        started_at = int(time.time())
+        await _set_status(job_id, status="running", synced=0, fetched=0)
+
+        try:
+            settings_result = await asyncio.to_thread(
+                self.db.table("settings").select("value").eq("key", "fb_sync").execute
+            )
+            fb_settings = settings_result.data[0]["value"] if settings_result.data else {}
+            if fb_settings.get("page_id") and fb_settings.get("access_token"):
+                self.fb.set_credentials(fb_settings["page_id"], fb_settings["access_token"])
+
+            # Only ask Facebook for posts since the last completed run
+            since = fb_settings.get("last_incremental_sync_at")
+            synced = fetched = 0
+            cursor = None
+            while True:
+                posts, cursor, has_more = await asyncio.to_thread(
+                    self.fb.fetch_posts_batch, batch_size=BATCH_SIZE, cursor=cursor, since=since
+                )
+                fetched += len(posts)
+                synced += await asyncio.to_thread(self._store, posts)
+                await _set_status(job_id, synced=synced, fetched=fetched)
+                if not has_more:
+                    break
+
+            # Merge only what this run changed, under fb_sync_finish's row lock,
+            # so edits made meanwhile (cursor, credentials, running total by
+            # /social/sync) aren't overwritten by the copy read at the start
+            finish = self.db.rpc("fb_sync_finish", {
+                "p_settings": {
+                    "page_id": self.fb.page_id,
+                    "last_sync": datetime.now(timezone.utc).isoformat(),
+                    "last_incremental_sync_at": started_at,
+                },
+                "p_synced": synced,
+            })
+            await asyncio.to_thread(finish.execute)
+            await settings_cache.invalidate_settings()
+
+            await _set_status(job_id, status="finished", synced=synced, fetched=fetched)
+            logger.info(f"Facebook sync {job_id} finished: {synced} new of {fetched} fetched")
+            return {"success": True, "synced": synced, "fetched": fetched}
+
+        except Exception as e:
+            logger.error(f"Facebook sync {job_id} failed: {e}")
+            await _set_status(job_id, status="failed", error=str(e))
+            return {"success": False, "error": str(e)}
+
+    def _store(self, posts: list) -> int:
+        """INSERT ... ON CONFLICT (post_id) DO NOTHING; returns the number of new rows."""
+        stored = 0
+        for chunk in chunked(posts):
+            result = self.db.table("social_feed").upsert(
+                chunk, on_conflict="post_id", ignore_duplicates=True
+            ).execute()
+            stored += len(result.data or [])
+        return stored
+
+
+async def enqueue_sync() -> str:
+    """Start a sync on this process's event loop and return its job id."""
+    job_id = uuid4().hex
+    await _set_status(job_id, status="queued")
+    task = asyncio.create_task(FacebookSyncWorker().sync(job_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job_id
+
+
+# Standalone script for cron job
+async def main():
+    """Main entry point for cron job"""
+    result = await FacebookSyncWorker().sync(uuid4().hex)
+    print(f"Facebook sync completed: {result}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
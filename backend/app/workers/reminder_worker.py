@@ -4,6 +4,7 @@ Run this as a scheduled job (cron/celery)
 """
 import asyncio
 from datetime import datetime
+from typing import List
 from app.services.occasion_service import OccasionService
 from app.database import get_db_client
 import logging
@@ -0,0 +1,48 @@
+"""
+Gunicorn configuration for production.
+
+    gunicorn app.main:app -c gunicorn_conf.py
+
+The app is imported once in the master (preload_app) so settings parsing and
+module imports are shared copy-on-write by the forked workers.
+"""
+import multiprocessing
+import os
+
+from uvicorn.workers import UvicornWorker
+
+
+class UvloopWorker(UvicornWorker):
+    """
+    Uvicorn worker pinned to uvloop + httptools (both ship with uvicorn[standard]).
+    The stock worker's "auto" would quietly fall back to asyncio/h11 if they
+    were missing; this fails at boot instead.
+    """
+
+    CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "loop": "uvloop", "http": "httptools"}
+
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = UvloopWorker
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+preload_app = True
+reuse_port = True
+accesslog = "-"
+
+
+def post_fork(server, worker):
+    """
+    Never share the master's sockets/pools with workers.
+    Importing the app builds database clients in the master (module-level AI
+    and occasion services call get_db_client()), but none of them connect
+    there: PostgresClient opens its pool on first use in each process, and
+    HTTP clients connect per request. Clearing the factories also rebuilds
+    any client later fetched through them in the worker.
+    """
+    from app import database
+    from app.services import facebook_sync
+
+    database._client.cache_clear()
+    database._create_postgres_client.cache_clear()
+    database._supabase_http_client.cache_clear()
+    facebook_sync._graph_http_client.cache_clear()
@@ -12,6 +12,21 @@ os.environ["SUPABASE_ANON_KEY"] = "test-anon-key"
 os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "test-service-key"
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Keep in-process caches from leaking between tests."""
+    from app.core import security
+    from app.routers import auth, orders
+    from app.services import catalog_cache, settings_cache
+    catalog_cache.clear_local()
+    settings_cache.clear_local()
+    orders._DISCOUNT_CACHE.clear()
+    orders._SEEN_EVENTS.clear()
+    auth._USER_CACHE.clear()
+    security._REVOKED.clear()
+    yield
+
+
 @pytest.fixture
 def mock_supabase():
     """Mock Supabase client for testing."""
@@ -30,8 +45,7 @@ def mock_supabase():
 @pytest.fixture
 def client(mock_supabase):
     """Test client with mocked Supabase."""
-    with patch("app.database.supabase", mock_supabase), \
-         patch("app.database.supabase_admin", mock_supabase):
+    with patch("app.database._client", MagicMock(return_value=mock_supabase)):
         from app.main import app
         with TestClient(app) as test_client:
             yield test_client
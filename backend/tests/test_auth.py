@@ -11,7 +11,7 @@ class TestAuthLogin:
     def test_login_success(self, client, mock_supabase):
         """Test successful admin login."""
         # Setup mock - admin user exists
-        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [{
+        mock_supabase.table.return_value.select.return_value.eq.return_value.limit.return_value.execute.return_value.data = [{
             "id": "test-user-id",
             "email": "admin@yenflowers.vn",
             "full_name": "Admin",
@@ -33,7 +33,7 @@ class TestAuthLogin:
 
     def test_login_wrong_password(self, client, mock_supabase):
         """Test login fails with wrong password."""
-        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [{
+        mock_supabase.table.return_value.select.return_value.eq.return_value.limit.return_value.execute.return_value.data = [{
             "id": "test-user-id",
             "email": "admin@yenflowers.vn",
             "full_name": "Admin",
@@ -51,7 +51,7 @@ class TestAuthLogin:
 
     def test_login_user_not_found(self, client, mock_supabase):
         """Test login fails when user doesn't exist."""
-        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = []
+        mock_supabase.table.return_value.select.return_value.eq.return_value.limit.return_value.execute.return_value.data = []
 
         response = client.post("/api/v1/auth/login", json={
             "email": "notfound@example.com",
@@ -62,7 +62,7 @@ class TestAuthLogin:
 
     def test_login_non_admin_rejected(self, client, mock_supabase):
         """Test login fails for non-admin users."""
-        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [{
+        mock_supabase.table.return_value.select.return_value.eq.return_value.limit.return_value.execute.return_value.data = [{
             "id": "test-user-id",
             "email": "customer@example.com",
             "full_name": "Customer",
@@ -80,7 +80,7 @@ class TestAuthLogin:
 
     def test_login_staff_allowed(self, client, mock_supabase):
         """Test staff role can login."""
-        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [{
+        mock_supabase.table.return_value.select.return_value.eq.return_value.limit.return_value.execute.return_value.data = [{
             "id": "test-staff-id",
             "email": "staff@yenflowers.vn",
             "full_name": "Staff",
@@ -123,13 +123,15 @@ class TestAuthMe:
     def test_me_valid_token(self, client, mock_supabase):
         """Test getting current user with valid token."""
         # First login to get a token
-        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [{
+        user = {
             "id": "test-user-id",
             "email": "admin@yenflowers.vn",
             "full_name": "Admin",
             "role": "admin",
             "password_hash": None
-        }]
+        }
+        mock_supabase.table.return_value.select.return_value.eq.return_value.limit.return_value.execute.return_value.data = [user]
+        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [user]
 
         login_response = client.post("/api/v1/auth/login", json={
             "email": "admin@yenflowers.vn",
@@ -145,6 +147,28 @@ class TestAuthMe:
         assert data["email"] == "admin@yenflowers.vn"
         assert data["role"] == "admin"
 
+    def test_me_cached_until_logout(self, client, mock_supabase):
+        """Repeat /me calls skip the profile lookup; logout revokes the token."""
+        from app.core.security import create_access_token
+
+        profiles = mock_supabase.table.return_value.select.return_value.eq.return_value
+        profiles.execute.return_value.data = [{
+            "id": "test-user-id",
+            "email": "admin@yenflowers.vn",
+            "full_name": "Admin",
+            "role": "admin"
+        }]
+        token = create_access_token(
+            {"user_id": "test-user-id", "email": "admin@yenflowers.vn", "role": "admin"}
+        )
+
+        assert client.get(f"/api/v1/auth/me?token={token}").status_code == 200
+        assert client.get(f"/api/v1/auth/me?token={token}").status_code == 200
+        assert profiles.execute.call_count == 1
+
+        client.post(f"/api/v1/auth/logout?token={token}")
+        assert client.get(f"/api/v1/auth/me?token={token}").status_code == 401
+
     def test_me_invalid_token(self, client):
         """Test /me with invalid token."""
         response = client.get("/api/v1/auth/me?token=invalid-token")
@@ -199,3 +223,20 @@ class TestSecurityModule:
 
         result = decode_token("invalid-token")
         assert result is None
+
+    def test_cached_token_rejected_after_expiry(self):
+        """A token decoded once must still be rejected once it expires."""
+        import asyncio
+        from fastapi import HTTPException
+        from app.core.security import create_access_token
+        from app.dependencies import get_current_user_jwt
+
+        token = create_access_token(
+            {"user_id": "test-id", "email": "test@example.com", "role": "admin"}
+        )
+        assert asyncio.run(get_current_user_jwt(token)).user_id == "test-id"
+
+        with patch("app.core.security.time.time", return_value=10**12):
+            with pytest.raises(HTTPException) as exc:
+                asyncio.run(get_current_user_jwt(token))
+        assert exc.value.status_code == 401
@@ -0,0 +1,109 @@
+"""
+Tests for the DATABASE_URL-mode client: query builder and connection pool (no live database needed).
+"""
+import os
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import psycopg2.pool
+import pytest
+from psycopg2.extensions import adapt
+
+from app.database import PostgresClient, PostgresTableQuery
+
+
+IDS = ["550e8400-e29b-41d4-a716-446655440000", "550e8400-e29b-41d4-a716-446655440001"]
+
+
+def make_client():
+    """PostgresClient stand-in whose connection records executed statements."""
+    cursor = MagicMock()
+    cursor.fetchall.return_value = []
+    conn = MagicMock()
+    conn.prepared = set()
+    conn.cursor.return_value.__enter__.return_value = cursor
+    client = MagicMock()
+
+    @contextmanager
+    def _conn():
+        yield conn
+
+    client._conn = _conn
+    return client, cursor
+
+
+class TestInFilter:
+    """in_() must bind values Postgres can type from the column (uuid[], not text[])."""
+
+    def test_select_in_binds_untyped_array_literal(self):
+        client, cursor = make_client()
+        PostgresTableQuery(client, "products").select("id").in_("id", IDS).execute()
+
+        prepare, execute = cursor.execute.call_args_list
+        assert prepare.args[0].endswith('"id" = ANY($1)')
+        (param,) = execute.args[1]
+        assert param == '{"%s","%s"}' % tuple(IDS)
+        # A quoted literal (type unknown), not an ARRAY[...] constructor (text[])
+        assert adapt(param).getquoted().startswith(b"'{")
+
+    def test_update_in_binds_untyped_array_literal(self):
+        client, cursor = make_client()
+        PostgresTableQuery(client, "social_feed").update({"is_imported_as_product": True}).in_("id", IDS).execute()
+
+        query, params = cursor.execute.call_args.args
+        assert params == [True, '{"%s","%s"}' % tuple(IDS)]
+
+    def test_or_in_binds_untyped_array_literal(self):
+        client, cursor = make_client()
+        PostgresTableQuery(client, "products").select("id").or_(f"id.in.({','.join(IDS)}),sku.eq.X").execute()
+
+        execute = cursor.execute.call_args_list[-1]
+        assert execute.args[1][0] == '{"%s","%s"}' % tuple(IDS)
+
+
+class TestConnectionSlots:
+    """An exhausted pool makes callers wait (up to the timeout) instead of failing at once."""
+
+    def make_pool(self):
+        # min_size=0: nothing connects until a connection is checked out
+        client = PostgresClient("postgresql://unused", min_size=0, max_size=1, timeout_seconds=0.05)
+        client._checkout = MagicMock(return_value=MagicMock(closed=False))
+        client._pool = MagicMock()
+        client._pool_pid = os.getpid()
+        return client
+
+    def test_waits_then_times_out_when_all_connections_busy(self):
+        client = self.make_pool()
+        with client._conn():
+            with pytest.raises(psycopg2.pool.PoolError):
+                with client._conn():
+                    pass
+        assert client._checkout.call_count == 1
+
+    def test_slot_released_after_use(self):
+        client = self.make_pool()
+        with client._conn():
+            pass
+        with client._conn():
+            pass
+        assert client._pool.putconn.call_count == 2
+
+
+class TestLazyPool:
+    """The pool opens on first use in each process, not when the client is built."""
+
+    def test_client_creation_opens_no_connections(self):
+        with patch("app.database.psycopg2.pool.ThreadedConnectionPool") as pool_cls:
+            client = PostgresClient("postgresql://u:p@127.0.0.1:1/x")
+            pool_cls.assert_not_called()
+            client._get_pool()
+            client._get_pool()
+        pool_cls.assert_called_once()
+
+    def test_forked_process_gets_its_own_pool(self):
+        with patch("app.database.psycopg2.pool.ThreadedConnectionPool") as pool_cls:
+            client = PostgresClient("postgresql://u:p@127.0.0.1:1/x")
+            client._get_pool()
+            with patch("app.database.os.getpid", return_value=os.getpid() + 1):
+                client._get_pool()
+        assert pool_cls.call_count == 2
@@ -30,7 +30,7 @@ class TestFacebookSyncService:
     
     def test_fetch_photos_success(self):
         """fetch_page_photos should parse FB API response correctly."""
-        with patch("httpx.Client") as mock_client:
+        with patch("app.services.facebook_sync._graph_http_client") as mock_client:
             mock_response = MagicMock()
             mock_response.json.return_value = {
                 "data": [
@@ -47,7 +47,7 @@ class TestFacebookSyncService:
                 ]
             }
             mock_response.raise_for_status = MagicMock()
-            mock_client.return_value.__enter__.return_value.get.return_value = mock_response
+            mock_client.return_value.get.return_value = mock_response
             
             service = FacebookSyncService()
             service.page_id = "test_page"
@@ -63,11 +63,11 @@ class TestFacebookSyncService:
     
     def test_fetch_photos_with_date_filter(self):
         """fetch_page_photos with days_back should add 'since' param."""
-        with patch("httpx.Client") as mock_client:
+        with patch("app.services.facebook_sync._graph_http_client") as mock_client:
             mock_response = MagicMock()
             mock_response.json.return_value = {"data": []}
             mock_response.raise_for_status = MagicMock()
-            mock_client.return_value.__enter__.return_value.get.return_value = mock_response
+            mock_client.return_value.get.return_value = mock_response
             
             service = FacebookSyncService()
             service.page_id = "test_page"
@@ -82,7 +82,7 @@ class TestFacebookSyncService:
             service.fetch_page_photos(limit=10, days_back=days_back)
             
             # Check call args
-            call_args = mock_client.return_value.__enter__.return_value.get.call_args
+            call_args = mock_client.return_value.get.call_args
             assert call_args is not None
             params = call_args[1]["params"]
             
@@ -93,8 +93,8 @@ class TestFacebookSyncService:
     
     def test_fetch_photos_api_error(self):
         """fetch_page_photos should raise exception on API error."""
-        with patch("httpx.Client") as mock_client:
-            mock_client.return_value.__enter__.return_value.get.side_effect = Exception("API Error")
+        with patch("app.services.facebook_sync._graph_http_client") as mock_client:
+            mock_client.return_value.get.side_effect = Exception("API Error")
             
             service = FacebookSyncService()
             service.page_id = "test_page"
@@ -105,7 +105,7 @@ class TestFacebookSyncService:
     
     def test_fetch_posts_filters_no_image(self):
         """fetch_page_posts should skip posts without images."""
-        with patch("httpx.Client") as mock_client:
+        with patch("app.services.facebook_sync._graph_http_client") as mock_client:
             mock_response = MagicMock()
             mock_response.json.return_value = {
                 "data": [
@@ -124,7 +124,7 @@ class TestFacebookSyncService:
                 ]
             }
             mock_response.raise_for_status = MagicMock()
-            mock_client.return_value.__enter__.return_value.get.return_value = mock_response
+            mock_client.return_value.get.return_value = mock_response
             
             service = FacebookSyncService()
             service.page_id = "test_page"
@@ -18,6 +18,7 @@ def occasion_service():
     service.db.eq = Mock(return_value=service.db)
     service.db.gte = Mock(return_value=service.db)
     service.db.order = Mock(return_value=service.db)
+    service.db.limit = Mock(return_value=service.db)
     service.db.insert = Mock(return_value=service.db)
     service.db.update = Mock(return_value=service.db)
     service.db.delete = Mock(return_value=service.db)
@@ -149,6 +150,33 @@ class TestOccasionCRUD:
         
         # Should not raise exception
         await occasion_service.delete_occasion('occ1')
+    
+    @pytest.mark.asyncio
+    async def test_update_occasion_if_owner_filters_by_user(self, occasion_service):
+        """Ownership is checked by the UPDATE itself"""
+        occasion_service.db.execute.return_value = Mock(data=[{
+            'id': 'occ1',
+            'user_id': 'user1',
+            'occasion_name': 'Updated Name'
+        }])
+        
+        result = await occasion_service.update_occasion_if_owner(
+            'occ1', 'user1', {'occasion_name': 'Updated Name'}
+        )
+        
+        assert result['occasion_name'] == 'Updated Name'
+        occasion_service.db.eq.assert_any_call("user_id", "user1")
+        assert occasion_service.db.execute.await_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_delete_occasion_if_owner_not_owned(self, occasion_service):
+        """Deleting someone else's occasion matches no rows"""
+        occasion_service.db.execute.return_value = Mock(data=[])
+        
+        deleted = await occasion_service.delete_occasion_if_owner('occ1', 'user2')
+        
+        assert deleted is False
+        occasion_service.db.eq.assert_any_call("user_id", "user2")
 
 
 class TestReminders:
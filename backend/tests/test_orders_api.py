@@ -2,10 +2,34 @@
 Tests for Orders/Checkout API endpoints.
 Covers: checkout flow, order creation, stock validation, payments, edge cases
 """
+import hashlib
+import hmac
+import json
+import time
 from unittest.mock import MagicMock, patch
 import pytest
 
 
+WEBHOOK_SECRET = "whsec_test"
+
+
+def signed_webhook(payload: dict, timestamp: int | None = None):
+    """Body and headers of a Stripe webhook signed with WEBHOOK_SECRET."""
+    body = json.dumps(payload)
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = hmac.new(
+        WEBHOOK_SECRET.encode(), f"{timestamp}.{body}".encode(), hashlib.sha256
+    ).hexdigest()
+    return {"content": body, "headers": {"stripe-signature": f"t={timestamp},v1={signature}"}}
+
+
+@pytest.fixture
+def webhook_secret():
+    with patch("app.routers.orders.settings") as mock_settings:
+        mock_settings.stripe_webhook_secret = WEBHOOK_SECRET
+        yield
+
+
 class TestCheckoutAPI:
     """Test checkout and order creation."""
     
@@ -27,7 +51,7 @@ class TestCheckoutAPI:
     
     def test_checkout_product_not_found(self, client, mock_supabase):
         """POST /orders/checkout with invalid product ID should return 400."""
-        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = []
+        mock_supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = []
         
         payload = {
             "items": [{"product_id": "550e8400-e29b-41d4-a716-000000000000", "quantity": 1}],
@@ -46,7 +70,7 @@ class TestCheckoutAPI:
     def test_checkout_unpublished_product(self, client, mock_supabase, sample_product):
         """POST /orders/checkout with unpublished product should return 400."""
         unpublished = {**sample_product, "is_published": False}
-        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [unpublished]
+        mock_supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = [unpublished]
         
         payload = {
             "items": [{"product_id": sample_product["id"], "quantity": 1}],
@@ -65,7 +89,7 @@ class TestCheckoutAPI:
     def test_checkout_insufficient_stock(self, client, mock_supabase, sample_product):
         """POST /orders/checkout with quantity > stock should return 400."""
         low_stock = {**sample_product, "stock_quantity": 2}
-        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [low_stock]
+        mock_supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = [low_stock]
         
         payload = {
             "items": [{"product_id": sample_product["id"], "quantity": 10}],
@@ -87,26 +111,24 @@ class TestCheckoutAPI:
         def table_side_effect(table_name):
             mock_table = MagicMock()
             if table_name == "products":
-                mock_table.select.return_value.eq.return_value.execute.return_value.data = [sample_product]
-                mock_table.update.return_value.eq.return_value.execute.return_value.data = []
-            elif table_name == "orders":
-                mock_table.insert.return_value.execute.return_value.data = [sample_order]
-            elif table_name == "order_items":
-                mock_table.insert.return_value.execute.return_value.data = [{
-                    "id": "550e8400-e29b-41d4-a716-446655449999",
-                    "product_id": sample_product["id"],
-                    "product_name": sample_product["name_vi"],
-                    "variant_name": None,
-                    "quantity": 1,
-                    "unit_price": 450000,
-                    "total_price": 450000,
-                    "order_id": sample_order["id"]
-                }]
+                mock_table.select.return_value.in_.return_value.execute.return_value.data = [sample_product]
             else:
                 mock_table.select.return_value.eq.return_value.execute.return_value.data = []
             return mock_table
         
         mock_supabase.table.side_effect = table_side_effect
+        mock_supabase.rpc.return_value.execute.return_value.data = [{
+            "order_with_items": {**sample_order, "items": [{
+                "id": "550e8400-e29b-41d4-a716-446655449999",
+                "product_id": sample_product["id"],
+                "product_name": sample_product["name_vi"],
+                "variant_name": None,
+                "quantity": 1,
+                "unit_price": 450000,
+                "total_price": 450000,
+                "order_id": sample_order["id"]
+            }]}
+        }]
         
         payload = {
             "items": [{"product_id": sample_product["id"], "quantity": 1}],
@@ -131,26 +153,24 @@ class TestCheckoutAPI:
         def table_side_effect(table_name):
             mock_table = MagicMock()
             if table_name == "products":
-                mock_table.select.return_value.eq.return_value.execute.return_value.data = [sample_product]
-                mock_table.update.return_value.eq.return_value.execute.return_value.data = []
-            elif table_name == "orders":
-                mock_table.insert.return_value.execute.return_value.data = [sample_order]
-            elif table_name == "order_items":
-                mock_table.insert.return_value.execute.return_value.data = [{
-                    "id": "550e8400-e29b-41d4-a716-446655449999",
-                    "product_id": sample_product["id"],
-                    "product_name": sample_product["name_vi"],
-                    "variant_name": None,
-                    "quantity": 1,
-                    "unit_price": 450000,
-                    "total_price": 450000,
-                    "order_id": sample_order["id"]
-                }]
+                mock_table.select.return_value.in_.return_value.execute.return_value.data = [sample_product]
             else:
                 mock_table.select.return_value.eq.return_value.execute.return_value.data = []
             return mock_table
         
         mock_supabase.table.side_effect = table_side_effect
+        mock_supabase.rpc.return_value.execute.return_value.data = [{
+            "order_with_items": {**sample_order, "items": [{
+                "id": "550e8400-e29b-41d4-a716-446655449999",
+                "product_id": sample_product["id"],
+                "product_name": sample_product["name_vi"],
+                "variant_name": None,
+                "quantity": 1,
+                "unit_price": 450000,
+                "total_price": 450000,
+                "order_id": sample_order["id"]
+            }]}
+        }]
         
         payload = {
             "items": [{"product_id": sample_product["id"], "quantity": 1}],
@@ -164,6 +184,9 @@ class TestCheckoutAPI:
         }
         response = client.post("/api/v1/orders/checkout", json=payload)
         assert response.status_code == 200
+        order = mock_supabase.rpc.call_args.args[1]["p_order"]
+        assert order["shipping_fee"] == 25000
+        assert order["total"] == 450000 + 25000
     
     def test_checkout_with_sale_price(self, client, mock_supabase, sample_product, sample_order):
         """POST /orders/checkout should use sale_price if available."""
@@ -173,26 +196,24 @@ class TestCheckoutAPI:
         def table_side_effect(table_name):
             mock_table = MagicMock()
             if table_name == "products":
-                mock_table.select.return_value.eq.return_value.execute.return_value.data = [product_on_sale]
-                mock_table.update.return_value.eq.return_value.execute.return_value.data = []
-            elif table_name == "orders":
-                mock_table.insert.return_value.execute.return_value.data = [sample_order]
-            elif table_name == "order_items":
-                mock_table.insert.return_value.execute.return_value.data = [{
-                    "id": "550e8400-e29b-41d4-a716-446655449999",
-                    "product_id": sample_product["id"],
-                    "product_name": sample_product["name_vi"],
-                    "variant_name": None,
-                    "quantity": 1,
-                    "unit_price": 400000,
-                    "total_price": 400000,
-                    "order_id": sample_order["id"]
-                }]
+                mock_table.select.return_value.in_.return_value.execute.return_value.data = [product_on_sale]
             else:
                 mock_table.select.return_value.eq.return_value.execute.return_value.data = []
             return mock_table
         
         mock_supabase.table.side_effect = table_side_effect
+        mock_supabase.rpc.return_value.execute.return_value.data = [{
+            "order_with_items": {**sample_order, "items": [{
+                "id": "550e8400-e29b-41d4-a716-446655449999",
+                "product_id": sample_product["id"],
+                "product_name": sample_product["name_vi"],
+                "variant_name": None,
+                "quantity": 1,
+                "unit_price": 400000,
+                "total_price": 400000,
+                "order_id": sample_order["id"]
+            }]}
+        }]
         
         payload = {
             "items": [{"product_id": sample_product["id"], "quantity": 1}],
@@ -206,6 +227,39 @@ class TestCheckoutAPI:
         }
         response = client.post("/api/v1/orders/checkout", json=payload)
         assert response.status_code == 200
+        items = mock_supabase.rpc.call_args.args[1]["p_items"]
+        assert items[0]["unit_price"] == 400000
+    
+    def test_checkout_payload_serializes_decimal_prices(self, client, mock_supabase, sample_product, sample_order):
+        """DATABASE_URL mode reads NUMERIC prices as Decimal; the place_order JSON must still encode."""
+        import json
+        from decimal import Decimal
+        from app.database import _process_value
+
+        product = {**sample_product, "price": Decimal("450000"), "sale_price": Decimal("400000")}
+        mock_supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = [product]
+        mock_supabase.rpc.return_value.execute.return_value.data = [{"order_with_items": {**sample_order, "items": []}}]
+
+        payload = {
+            "items": [{"product_id": sample_product["id"], "quantity": 2}],
+            "shipping_address": {
+                "full_name": "Test",
+                "phone": "0901234567",
+                "address_line": "123 Test",
+                "district": "1",
+                "city": "Hồ Chí Minh"
+            }
+        }
+        response = client.post("/api/v1/orders/checkout", json=payload)
+        assert response.status_code == 200
+
+        params = mock_supabase.rpc.call_args.args[1]
+        order = json.loads(_process_value(params["p_order"]).dumps(params["p_order"]))
+        items = json.loads(_process_value(params["p_items"]).dumps(params["p_items"]))
+        assert order["subtotal"] == 800000
+        assert order["total"] == 800000 + 25000
+        assert items[0]["unit_price"] == 400000
+        assert items[0]["total_price"] == 800000
     
     def test_checkout_missing_shipping_address(self, client, mock_supabase):
         """POST /orders/checkout without shipping_address should return 422."""
@@ -221,6 +275,21 @@ class TestCheckoutAPI:
         pass
 
 
+class TestDeliveryFee:
+    """Test delivery fee calculation."""
+    
+    def test_district_names_normalized(self):
+        """District names with a 'Quận'/'quan' prefix or spaces map to the fee table."""
+        from app.routers.orders import calculate_delivery_fee
+
+        assert calculate_delivery_fee("1") == 25000
+        assert calculate_delivery_fee("Quận 1") == 25000
+        assert calculate_delivery_fee("quan 5") == 30000
+        assert calculate_delivery_fee("Tan Binh") == 35000
+        assert calculate_delivery_fee("Go Vap") == 40000
+        assert calculate_delivery_fee("Thủ Đức") == 35000
+
+
 class TestDiscountCodes:
     """Test discount code application."""
     
@@ -244,29 +313,26 @@ class TestDiscountCodes:
         def table_side_effect(table_name):
             mock_table = MagicMock()
             if table_name == "products":
-                mock_table.select.return_value.eq.return_value.execute.return_value.data = [sample_product]
-                mock_table.update.return_value.eq.return_value.execute.return_value.data = []
+                mock_table.select.return_value.in_.return_value.execute.return_value.data = [sample_product]
             elif table_name == "discount_codes":
                 mock_table.select.return_value.eq.return_value.eq.return_value.execute.return_value.data = [discount]
-                mock_table.update.return_value.eq.return_value.execute.return_value.data = []
-            elif table_name == "orders":
-                mock_table.insert.return_value.execute.return_value.data = [sample_order]
-            elif table_name == "order_items":
-                mock_table.insert.return_value.execute.return_value.data = [{
-                    "id": "550e8400-e29b-41d4-a716-446655449999",
-                    "product_id": sample_product["id"],
-                    "product_name": sample_product["name_vi"],
-                    "variant_name": None,
-                    "quantity": 1,
-                    "unit_price": 450000,
-                    "total_price": 450000,
-                    "order_id": sample_order["id"]
-                }]
             else:
                 mock_table.select.return_value.eq.return_value.execute.return_value.data = []
             return mock_table
         
         mock_supabase.table.side_effect = table_side_effect
+        mock_supabase.rpc.return_value.execute.return_value.data = [{
+            "order_with_items": {**sample_order, "items": [{
+                "id": "550e8400-e29b-41d4-a716-446655449999",
+                "product_id": sample_product["id"],
+                "product_name": sample_product["name_vi"],
+                "variant_name": None,
+                "quantity": 1,
+                "unit_price": 450000,
+                "total_price": 450000,
+                "order_id": sample_order["id"]
+            }]}
+        }]
         
         payload = {
             "items": [{"product_id": sample_product["id"], "quantity": 1}],
@@ -281,6 +347,63 @@ class TestDiscountCodes:
         }
         response = client.post("/api/v1/orders/checkout", json=payload)
         assert response.status_code == 200
+        params = mock_supabase.rpc.call_args.args[1]
+        assert params["p_discount_id"] == discount["id"]
+        assert params["p_order"]["discount_amount"] == 45000
+    
+    def test_checkout_refused_discount_repriced_from_fresh_row(self, client, mock_supabase, sample_product, sample_order):
+        """If place_order refuses a cached discount, the code is re-read and checkout retried."""
+        from postgrest.exceptions import APIError
+        from app.routers import orders
+
+        discount = {
+            "id": "550e8400-e29b-41d4-a716-446655440010",
+            "discount_type": "fixed",
+            "discount_value": 50000,
+            "min_order_value": None,
+            "max_uses": None,
+            "used_count": 0,
+            "starts_at": None,
+            "expires_at": None
+        }
+        discounts = MagicMock()
+        # Cached while active, then deactivated before the order is written
+        discounts.select.return_value.eq.return_value.eq.return_value.execute.side_effect = [
+            MagicMock(data=[discount]), MagicMock(data=[])
+        ]
+
+        def table_side_effect(table_name):
+            if table_name == "discount_codes":
+                return discounts
+            mock_table = MagicMock()
+            mock_table.select.return_value.in_.return_value.execute.return_value.data = [sample_product]
+            return mock_table
+
+        mock_supabase.table.side_effect = table_side_effect
+        mock_supabase.rpc.return_value.execute.side_effect = [
+            APIError({"message": orders.DISCOUNT_UNAVAILABLE, "code": "PT409", "details": None, "hint": None}),
+            MagicMock(data=[{"order_with_items": {**sample_order, "items": []}}])
+        ]
+
+        payload = {
+            "items": [{"product_id": sample_product["id"], "quantity": 1}],
+            "shipping_address": {
+                "full_name": "Test",
+                "phone": "0901234567",
+                "address_line": "123 Test",
+                "district": "1",
+                "city": "Hồ Chí Minh"
+            },
+            "discount_code": "GONE50"
+        }
+        response = client.post("/api/v1/orders/checkout", json=payload)
+
+        assert response.status_code == 200
+        first, retry = (c.args[1] for c in mock_supabase.rpc.call_args_list)
+        assert first["p_discount_id"] == discount["id"]
+        assert retry["p_discount_id"] is None
+        assert retry["p_order"]["discount_amount"] == 0
+        assert orders._DISCOUNT_CACHE["GONE50"] is None
     
     def test_checkout_with_expired_discount(self, client, mock_supabase, sample_product):
         """POST /orders/checkout with expired discount should not apply."""
@@ -290,6 +413,45 @@ class TestDiscountCodes:
     def test_checkout_with_min_order_not_met(self, client, mock_supabase, sample_product):
         """POST /orders/checkout with discount min_order_value not met should not apply."""
         pass
+    
+    def test_discount_lookup_cached_with_parsed_dates(self, mock_supabase):
+        """Discount codes are fetched once and their dates parsed on cache fill."""
+        from datetime import datetime
+        from app.routers.orders import get_discount, invalidate_discount
+
+        query = mock_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value
+        query.execute.return_value.data = [{
+            "id": "550e8400-e29b-41d4-a716-446655440010",
+            "code": "SALE10",
+            "starts_at": "2025-01-01T00:00:00Z",
+            "expires_at": None,
+        }]
+
+        first = get_discount(mock_supabase, "SALE10")
+        second = get_discount(mock_supabase, "SALE10")
+
+        assert first is second
+        assert isinstance(first["starts_at"], datetime)
+        assert query.execute.call_count == 1
+
+        invalidate_discount("SALE10")
+        get_discount(mock_supabase, "SALE10")
+        assert query.execute.call_count == 2
+
+    def test_discount_for_validity_rules(self):
+        """Validity checks compare against the pre-parsed dates and limits."""
+        from datetime import datetime, timedelta, timezone
+        from app.routers.orders import discount_for
+
+        now = datetime.now(timezone.utc)
+        d = {"discount_type": "percentage", "discount_value": 10, "used_count": 0}
+
+        assert discount_for(d, 500000, now) == 50000
+        assert discount_for({**d, "discount_type": "fixed", "discount_value": 20000}, 500000, now) == 20000
+        assert discount_for({**d, "starts_at": now + timedelta(days=1)}, 500000, now) is None
+        assert discount_for({**d, "expires_at": now - timedelta(days=1)}, 500000, now) is None
+        assert discount_for({**d, "max_uses": 5, "used_count": 5}, 500000, now) is None
+        assert discount_for({**d, "min_order_value": 600000}, 500000, now) is None
 
 
 class TestOrderTracking:
@@ -302,17 +464,19 @@ class TestOrderTracking:
         def table_side_effect(table_name):
             mock_table = MagicMock()
             if table_name == "orders":
-                mock_table.select.return_value.eq.return_value.execute.return_value.data = [sample_order]
-            elif table_name == "order_items":
+                # Items are embedded in the same query
                 mock_table.select.return_value.eq.return_value.execute.return_value.data = [{
-                    "id": "550e8400-e29b-41d4-a716-446655449999",
-                    "product_id": sample_product["id"],
-                    "product_name": sample_product["name_vi"],
-                    "variant_name": None,
-                    "quantity": 1,
-                    "unit_price": 450000,
-                    "total_price": 450000,
-                    "order_id": sample_order["id"]
+                    **sample_order,
+                    "items": [{
+                        "id": "550e8400-e29b-41d4-a716-446655449999",
+                        "product_id": sample_product["id"],
+                        "product_name": sample_product["name_vi"],
+                        "variant_name": None,
+                        "quantity": 1,
+                        "unit_price": 450000,
+                        "total_price": 450000,
+                        "order_id": sample_order["id"]
+                    }]
                 }]
             return mock_table
         
@@ -322,6 +486,8 @@ class TestOrderTracking:
         assert response.status_code == 200
         data = response.json()
         assert data["order_number"] == sample_order["order_number"]
+        assert len(data["items"]) == 1
+        mock_supabase.table.assert_called_once_with("orders")
     
     def test_get_order_not_found(self, client, mock_supabase):
         """GET /orders/{order_number} with invalid number should return 404."""
@@ -347,7 +513,7 @@ class TestStripePayment:
             response = client.post("/api/v1/orders/550e8400-e29b-41d4-a716-446655440003/payment/stripe")
             assert response.status_code == 500
     
-    def test_stripe_webhook_payment_success(self, client, mock_supabase):
+    def test_stripe_webhook_payment_success(self, client, mock_supabase, webhook_secret):
         """POST /orders/webhook/stripe with completed event should update order."""
         payload = {
             "type": "checkout.session.completed",
@@ -357,10 +523,70 @@ class TestStripePayment:
                 }
             }
         }
-        response = client.post("/api/v1/orders/webhook/stripe", json=payload)
+        response = client.post("/api/v1/orders/webhook/stripe", **signed_webhook(payload))
         assert response.status_code == 200
         assert response.json()["received"] == True
 
+    def test_stripe_webhook_redelivery_skipped(self, client, mock_supabase, webhook_secret):
+        """A redelivered event is acknowledged without updating the order again."""
+        payload = {
+            "id": "evt_123",
+            "type": "checkout.session.completed",
+            "data": {
+                "object": {
+                    "metadata": {"order_id": "550e8400-e29b-41d4-a716-446655440003"}
+                }
+            }
+        }
+        for _ in range(2):
+            response = client.post("/api/v1/orders/webhook/stripe", **signed_webhook(payload))
+            assert response.status_code == 200
+
+        assert mock_supabase.table.return_value.update.call_count == 1
+
+    def test_stripe_webhook_malformed_event(self, client, mock_supabase, webhook_secret):
+        """An event without a type fails schema validation."""
+        response = client.post(
+            "/api/v1/orders/webhook/stripe", **signed_webhook({"id": "evt_789", "data": {}})
+        )
+
+        assert response.status_code == 400
+        mock_supabase.table.return_value.update.assert_not_called()
+
+    def test_stripe_webhook_invalid_signature(self, client, mock_supabase, webhook_secret):
+        """Events whose signature doesn't match the secret are rejected."""
+        response = client.post(
+            "/api/v1/orders/webhook/stripe",
+            json={"id": "evt_456", "type": "checkout.session.completed"},
+            headers={"stripe-signature": "t=1,v1=bad"}
+        )
+
+        assert response.status_code == 400
+        mock_supabase.table.return_value.update.assert_not_called()
+
+    def test_stripe_webhook_stale_signature(self, client, mock_supabase, webhook_secret):
+        """A correctly signed event outside the replay tolerance is rejected."""
+        payload = {"id": "evt_old", "type": "checkout.session.completed", "data": {}}
+        response = client.post(
+            "/api/v1/orders/webhook/stripe",
+            **signed_webhook(payload, timestamp=int(time.time()) - 3600)
+        )
+
+        assert response.status_code == 400
+        mock_supabase.table.return_value.update.assert_not_called()
+
+    def test_stripe_webhook_without_secret(self, client, mock_supabase):
+        """Without STRIPE_WEBHOOK_SECRET no event is accepted."""
+        with patch("app.routers.orders.settings") as mock_settings:
+            mock_settings.stripe_webhook_secret = ""
+            response = client.post(
+                "/api/v1/orders/webhook/stripe",
+                json={"id": "evt_999", "type": "checkout.session.completed"}
+            )
+
+        assert response.status_code == 503
+        mock_supabase.table.return_value.update.assert_not_called()
+
 
 class TestEdgeCases:
     """Test edge cases and error handling."""
@@ -398,7 +624,7 @@ class TestEdgeCases:
     def test_checkout_very_large_quantity(self, client, mock_supabase, sample_product):
         """POST /orders/checkout with very large quantity should check stock."""
         product = {**sample_product, "stock_quantity": 10}
-        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [product]
+        mock_supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = [product]
         
         payload = {
             "items": [{"product_id": sample_product["id"], "quantity": 999999}],
@@ -421,26 +647,24 @@ class TestEdgeCases:
         def table_side_effect(table_name):
             mock_table = MagicMock()
             if table_name == "products":
-                mock_table.select.return_value.eq.return_value.execute.return_value.data = [sample_product]
-                mock_table.update.return_value.eq.return_value.execute.return_value.data = []
-            elif table_name == "orders":
-                mock_table.insert.return_value.execute.return_value.data = [sample_order]
-            elif table_name == "order_items":
-                mock_table.insert.return_value.execute.return_value.data = [{
-                    "id": "550e8400-e29b-41d4-a716-446655449999",
-                    "product_id": sample_product["id"],
-                    "product_name": sample_product["name_vi"],
-                    "variant_name": None,
-                    "quantity": 1,
-                    "unit_price": 450000,
-                    "total_price": 450000,
-                    "order_id": sample_order["id"]
-                }]
+                mock_table.select.return_value.in_.return_value.execute.return_value.data = [sample_product]
             else:
                 mock_table.select.return_value.eq.return_value.execute.return_value.data = []
             return mock_table
         
         mock_supabase.table.side_effect = table_side_effect
+        mock_supabase.rpc.return_value.execute.return_value.data = [{
+            "order_with_items": {**sample_order, "items": [{
+                "id": "550e8400-e29b-41d4-a716-446655449999",
+                "product_id": sample_product["id"],
+                "product_name": sample_product["name_vi"],
+                "variant_name": None,
+                "quantity": 1,
+                "unit_price": 450000,
+                "total_price": 450000,
+                "order_id": sample_order["id"]
+            }]}
+        }]
         
         payload = {
             "items": [
@@ -458,3 +682,54 @@ class TestEdgeCases:
         response = client.post("/api/v1/orders/checkout", json=payload)
         # Should handle duplicate items (combine or process separately)
         assert response.status_code == 200
+
+    def test_checkout_stock_taken_concurrently(self, client, mock_supabase, sample_product):
+        """If the stock is gone by the time the order is written, checkout answers 409."""
+        from postgrest.exceptions import APIError
+
+        mock_supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = [sample_product]
+        mock_supabase.rpc.return_value.execute.side_effect = APIError(
+            {"message": "Insufficient stock", "code": "PT409", "details": sample_product["id"], "hint": None}
+        )
+
+        payload = {
+            "items": [
+                {"product_id": sample_product["id"], "quantity": 2},
+                {"product_id": sample_product["id"], "quantity": 1}
+            ],
+            "shipping_address": {
+                "full_name": "Test",
+                "phone": "0901234567",
+                "address_line": "123 Test",
+                "district": "1",
+                "city": "Hồ Chí Minh"
+            }
+        }
+        response = client.post("/api/v1/orders/checkout", json=payload)
+
+        assert response.status_code == 409
+        assert response.json()["detail"] == "Insufficient stock"
+        mock_supabase.rpc.assert_called_once()
+        assert mock_supabase.rpc.call_args.args[0] == "place_order"
+
+    def test_checkout_duplicate_products_exceeding_stock(self, client, mock_supabase, sample_product):
+        """Stock is checked against the combined quantity of repeated lines."""
+        low_stock = {**sample_product, "stock_quantity": 2}
+        mock_supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = [low_stock]
+
+        payload = {
+            "items": [
+                {"product_id": sample_product["id"], "quantity": 2},
+                {"product_id": sample_product["id"], "quantity": 1}
+            ],
+            "shipping_address": {
+                "full_name": "Test",
+                "phone": "0901234567",
+                "address_line": "123 Test",
+                "district": "1",
+                "city": "Hồ Chí Minh"
+            }
+        }
+        response = client.post("/api/v1/orders/checkout", json=payload)
+        assert response.status_code == 400
+        assert "Insufficient stock" in response.json()["detail"]
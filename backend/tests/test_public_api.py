@@ -2,7 +2,8 @@
 Tests for public API endpoints.
 Covers: categories, products, blog, search
 """
-from unittest.mock import MagicMock, patch
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
 
 
 class TestHealthEndpoints:
@@ -115,6 +116,52 @@ class TestProductsAPI:
         response = client.get("/api/v1/products?page_size=100")
         assert response.status_code == 422
     
+    def test_list_products_via_asyncpg(self, client, mock_supabase, sample_product):
+        """GET /products uses the asyncpg pool when one is configured."""
+        from app.database import get_pg_pool
+        from app.main import app
+
+        pg = MagicMock()
+        pg.fetch = AsyncMock(return_value=[{**sample_product, "total_count": 13}])
+        app.dependency_overrides[get_pg_pool] = lambda: pg
+        try:
+            response = client.get("/api/v1/public/products?page=2&page_size=12&sort=price_asc&min_price=400000")
+        finally:
+            app.dependency_overrides.pop(get_pg_pool)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 13
+        assert data["total_pages"] == 2
+        assert "total_count" not in data["items"][0]
+        query, *params = pg.fetch.call_args.args
+        assert "price >= $2 ORDER BY price ASC, id ASC LIMIT $3 OFFSET $4" in query
+        assert "*," not in query and "search_tsv" not in query and "embedding" not in query
+        assert "category_id =" not in query
+        assert params == [True, 400000, 12, 12]
+        mock_supabase.table.assert_not_called()
+    
+    def test_list_products_caches_category_slug(self, client, sample_category):
+        """The category slug -> id lookup runs once across requests."""
+        from app.database import get_pg_pool
+        from app.main import app
+
+        pg = MagicMock()
+        pg.fetch = AsyncMock(return_value=[])
+        pg.fetchval = AsyncMock(return_value=sample_category["id"])
+        app.dependency_overrides[get_pg_pool] = lambda: pg
+        try:
+            for _ in range(2):
+                response = client.get("/api/v1/public/products?category=sinh-nhat")
+                assert response.status_code == 200
+        finally:
+            app.dependency_overrides.pop(get_pg_pool)
+
+        assert pg.fetchval.call_count == 1
+        query, *params = pg.fetch.call_args.args
+        assert "category_id = $2" in query
+        assert params[1] == sample_category["id"]
+    
     def test_get_featured_products(self, client, mock_supabase, sample_product):
         """GET /products/featured should return featured products."""
         mock_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.limit.return_value.execute.return_value.data = [sample_product]
@@ -180,11 +227,17 @@ class TestBlogAPI:
         """GET /blog/{slug} should increment view count."""
         mock_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.execute.return_value.data = [sample_blog_post]
         
-        response = client.get("/api/v1/blog/cach-cham-soc-hoa-hong")
+        response = client.get("/api/v1/public/blog/cach-cham-soc-hoa-hong")
         assert response.status_code == 200
+        client.get("/api/v1/public/blog/cach-cham-soc-hoa-hong")
         
-        # Verify update was called to increment view count
-        mock_supabase.table.return_value.update.assert_called()
+        # Views are batched: nothing written yet, one increment call per flush
+        mock_supabase.table.return_value.update.assert_not_called()
+        from app.routers.public import blog_views
+        asyncio.run(blog_views.flush())
+        mock_supabase.rpc.assert_called_once_with(
+            "increment_blog_views", {"p_views": {sample_blog_post["id"]: 2}}
+        )
 
 
 class TestSearchAPI:
@@ -211,3 +264,22 @@ class TestSearchAPI:
         assert response.status_code == 200
         data = response.json()
         assert len(data["items"]) == 1
+
+    def test_search_via_asyncpg_escapes_like_wildcards(self, client, sample_product):
+        """GET /search on the asyncpg pool matches q literally."""
+        from app.database import get_pg_pool
+        from app.main import app
+
+        pg = MagicMock()
+        pg.fetch = AsyncMock(return_value=[{**sample_product, "total_count": 1}])
+        app.dependency_overrides[get_pg_pool] = lambda: pg
+        try:
+            response = client.get("/api/v1/public/search?q=50%_off")
+        finally:
+            app.dependency_overrides.pop(get_pg_pool)
+
+        assert response.status_code == 200
+        assert response.json()["total"] == 1
+        _, pattern, tag, limit, offset = pg.fetch.call_args.args
+        assert pattern == "%50\\%\\_off%"
+        assert (tag, limit, offset) == ("50%_off", 12, 0)
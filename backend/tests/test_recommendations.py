@@ -277,5 +277,21 @@ class TestRecommendationEdgeCases:
         assert isinstance(results, list)
 
 
+class TestAIStatsEndpoint:
+    """GET /ai/admin/stats"""
+
+    def test_returns_ai_stats_row(self, client):
+        stats = {"total_interactions": 12, "total_searches": 5, "total_recommendation_clicks": 3}
+        db = Mock()
+        db.rpc.return_value.execute.return_value.data = [stats]
+
+        with patch("app.routers.ai.recommendation_engine.db", db):
+            response = client.get("/api/v1/ai/admin/stats")
+
+        assert response.status_code == 200
+        assert response.json() == {"success": True, "stats": stats}
+        db.rpc.assert_called_once_with("ai_stats")
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,22 @@
+-- =====================================================
+-- Migration: Full-text search column for admin product search
+-- Replaces three ILIKE '%...%' scans with a GIN lookup
+-- Restart the backend after applying: in DATABASE_URL mode its pooled
+-- connections hold prepared "SELECT * FROM products" statements, which fail
+-- with "cached plan must not change result type" once the column exists.
+-- =====================================================
+
+ALTER TABLE public.products
+ADD COLUMN IF NOT EXISTS search_tsv tsvector
+GENERATED ALWAYS AS (
+    to_tsvector('simple',
+        coalesce(name_vi, '') || ' ' ||
+        coalesce(name_en, '') || ' ' ||
+        coalesce(sku, ''))
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_products_search_tsv
+ON public.products USING gin(search_tsv);
+
+-- Comment for documentation
+COMMENT ON COLUMN public.products.search_tsv IS 'Generated tsvector over name_vi, name_en and sku for admin search (websearch_to_tsquery)';
@@ -0,0 +1,16 @@
+-- =====================================================
+-- Migration: Trigram indexes for substring product search
+-- Lets ILIKE '%...%' on names/SKU (storefront search, smart search)
+-- use an index instead of a sequential scan
+-- =====================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_products_name_vi_trgm
+ON public.products USING gin(name_vi gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_products_name_en_trgm
+ON public.products USING gin(name_en gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_products_sku_trgm
+ON public.products USING gin(sku gin_trgm_ops);
@@ -0,0 +1,53 @@
+-- =====================================================
+-- Migration: Composite indexes for admin list pages
+-- Each list filters on equality columns and orders by (created_at, id)
+-- DESC (posted_at for social_feed), which is also the keyset cursor, so
+-- every page is a single index range scan with no sort.
+-- social_feed.post_id (UNIQUE) and order_items(order_id) are already indexed.
+-- =====================================================
+
+-- Products
+CREATE INDEX IF NOT EXISTS idx_products_created_id
+ON public.products(created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_products_published_created
+ON public.products(is_published, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_products_category_created
+ON public.products(category_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_products_featured_created
+ON public.products(created_at DESC, id DESC)
+WHERE is_featured = TRUE;
+
+-- Orders (the composites cover the single-column ones they replace)
+CREATE INDEX IF NOT EXISTS idx_orders_created_id
+ON public.orders(created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_orders_status_created
+ON public.orders(order_status, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_orders_payment_created
+ON public.orders(payment_status, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS public.idx_orders_created;
+DROP INDEX IF EXISTS public.idx_orders_status;
+
+-- Blog posts
+CREATE INDEX IF NOT EXISTS idx_blog_created_id
+ON public.blog_posts(created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_blog_published_created
+ON public.blog_posts(is_published, created_at DESC, id DESC);
+
+-- Social feed
+CREATE INDEX IF NOT EXISTS idx_social_posted_id
+ON public.social_feed(posted_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_social_platform_posted
+ON public.social_feed(platform, posted_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_social_imported_posted
+ON public.social_feed(is_imported_as_product, posted_at DESC, id DESC);
+
+DROP INDEX IF EXISTS public.idx_social_platform;
@@ -0,0 +1,69 @@
+-- =====================================================
+-- Migration: Import a social feed item as a product atomically
+-- One RPC replaces SELECT feed + INSERT product + UPDATE feed, and the
+-- imported flag can no longer be set without the product existing
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION import_feed_as_product(
+    p_feed_id UUID,
+    p_slug TEXT,
+    p_name_vi TEXT,
+    p_name_en TEXT,
+    p_price NUMERIC,
+    p_category_id UUID
+)
+RETURNS SETOF products
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_feed social_feed;
+    v_slug TEXT := p_slug;
+    v_images JSONB;
+    v_product products;
+BEGIN
+    SELECT * INTO v_feed FROM social_feed WHERE id = p_feed_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;  -- empty result -> 404
+    END IF;
+
+    -- Slugs are unique: suffix a short random tag on collision
+    IF EXISTS (SELECT 1 FROM products WHERE slug = v_slug) THEN
+        v_slug := v_slug || '-' || substr(gen_random_uuid()::text, 1, 6);
+    END IF;
+
+    -- image_urls holds plain URLs or {url} objects; fall back to image_url
+    SELECT COALESCE(jsonb_agg(jsonb_build_object(
+               'url', COALESCE(img->>'url', img #>> '{}'),
+               'alt', p_name_vi,
+               'sort_order', ord - 1
+           ) ORDER BY ord), '[]'::jsonb)
+    INTO v_images
+    FROM jsonb_array_elements(
+        CASE
+            WHEN jsonb_array_length(COALESCE(v_feed.image_urls, '[]'::jsonb)) > 0 THEN v_feed.image_urls
+            WHEN v_feed.image_url IS NOT NULL THEN jsonb_build_array(v_feed.image_url)
+            ELSE '[]'::jsonb
+        END
+    ) WITH ORDINALITY AS t(img, ord)
+    WHERE COALESCE(img->>'url', img #>> '{}') IS NOT NULL;
+
+    INSERT INTO products (
+        slug, name_vi, name_en, price, category_id, images,
+        description_vi, fb_post_id, is_published
+    )
+    VALUES (
+        v_slug, p_name_vi, p_name_en, p_price, p_category_id, v_images,
+        v_feed.caption, v_feed.post_id, FALSE  -- draft by default
+    )
+    RETURNING * INTO v_product;
+
+    UPDATE social_feed
+    SET is_imported_as_product = TRUE,
+        imported_product_id = v_product.id
+    WHERE id = p_feed_id;
+
+    RETURN NEXT v_product;
+END;
+$$;
+
+COMMENT ON FUNCTION import_feed_as_product IS 'Create a draft product from a social feed item and mark the item imported, in one transaction';
@@ -0,0 +1,44 @@
+-- =====================================================
+-- Migration: Finish a Facebook sync batch in one call
+-- Merges the batch's sync state into settings.fb_sync and advances the
+-- running social_feed total under a row lock, so concurrent batches can't
+-- lose each other's counts and the endpoint needs no separate COUNT(*)
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION fb_sync_finish(
+    p_settings JSONB,
+    p_synced INT,
+    p_recount BOOLEAN DEFAULT FALSE
+)
+RETURNS SETOF settings
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_value JSONB;
+BEGIN
+    INSERT INTO settings (key, value, description)
+    VALUES ('fb_sync', '{}'::jsonb, 'Facebook sync settings')
+    ON CONFLICT (key) DO NOTHING;
+
+    SELECT value INTO v_value FROM settings WHERE key = 'fb_sync' FOR UPDATE;
+
+    -- Called after the batch is written: a recount already includes it
+    v_value := v_value || p_settings || jsonb_build_object(
+        'total_in_db',
+        CASE
+            WHEN p_recount OR jsonb_typeof(v_value->'total_in_db') IS DISTINCT FROM 'number'
+                THEN (SELECT count(*) FROM social_feed)
+            ELSE (v_value->>'total_in_db')::BIGINT + p_synced
+        END
+    );
+
+    RETURN QUERY
+    UPDATE settings
+    SET value = v_value,
+        updated_at = NOW()
+    WHERE key = 'fb_sync'
+    RETURNING *;
+END;
+$$;
+
+COMMENT ON FUNCTION fb_sync_finish IS 'Merge a sync batch''s state into settings.fb_sync and advance its social_feed total atomically';
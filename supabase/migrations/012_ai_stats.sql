@@ -0,0 +1,20 @@
+-- =====================================================
+-- Migration: AI usage counters in one call
+-- Replaces three count="exact" requests from GET /ai/admin/stats
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION ai_stats()
+RETURNS TABLE (
+    total_interactions BIGINT,
+    total_searches BIGINT,
+    total_recommendation_clicks BIGINT
+)
+LANGUAGE SQL STABLE
+AS $$
+    SELECT
+        (SELECT count(*) FROM user_interactions),
+        (SELECT count(*) FROM search_queries),
+        (SELECT count(*) FROM recommendation_clicks);
+$$;
+
+COMMENT ON FUNCTION ai_stats IS 'Row counts of the AI interaction, search and recommendation click tables';
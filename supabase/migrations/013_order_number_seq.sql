@@ -0,0 +1,14 @@
+-- =====================================================
+-- Migration: Collision-free order numbers
+-- order_number was YF-YYYYMMDD-<random 100..999> generated in the API,
+-- which collides within a day at modest volume. The column now defaults to
+-- a sequence-backed YF-YYYYMMDD-NNNNNN, assigned by the INSERT itself.
+-- =====================================================
+
+CREATE SEQUENCE IF NOT EXISTS public.order_number_seq;
+
+ALTER TABLE public.orders
+ALTER COLUMN order_number SET DEFAULT (
+    'YF-' || to_char(NOW() AT TIME ZONE 'Asia/Ho_Chi_Minh', 'YYYYMMDD')
+    || '-' || lpad(nextval('public.order_number_seq')::text, 6, '0')
+);
@@ -0,0 +1,45 @@
+-- =====================================================
+-- Migration: Atomic stock decrement for checkout
+-- Each product's stock is decremented with a conditional UPDATE, so two
+-- concurrent checkouts can never both take the last units. If any product
+-- is short, the function raises SQLSTATE PT409 (PostgREST answers 409) and
+-- every decrement it already made is rolled back.
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION decrement_stock(p_items JSONB)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_item RECORD;
+    v_short TEXT[] := '{}';
+BEGIN
+    -- One UPDATE per product (repeated lines summed), taken in id order so
+    -- concurrent checkouts lock rows in the same order and can't deadlock
+    FOR v_item IN
+        SELECT (e->>'product_id')::UUID AS product_id,
+               SUM((e->>'quantity')::INT) AS quantity
+        FROM jsonb_array_elements(p_items) AS e
+        GROUP BY 1
+        ORDER BY 1
+    LOOP
+        UPDATE public.products
+        SET stock_quantity = stock_quantity - v_item.quantity,
+            updated_at = NOW()
+        WHERE id = v_item.product_id
+          AND stock_quantity >= v_item.quantity;
+
+        IF NOT FOUND THEN
+            v_short := v_short || v_item.product_id::TEXT;
+        END IF;
+    END LOOP;
+
+    IF cardinality(v_short) > 0 THEN
+        RAISE EXCEPTION 'Insufficient stock'
+            USING ERRCODE = 'PT409',
+                  DETAIL = array_to_string(v_short, ',');
+    END IF;
+END;
+$$;
+
+COMMENT ON FUNCTION decrement_stock IS 'Atomically take [{product_id, quantity}] from stock, or raise PT409 without changing anything';
@@ -0,0 +1,67 @@
+-- =====================================================
+-- Migration: Write a checkout in one transaction
+-- The API prices the cart from its reads, then hands every write to this
+-- function: stock decrement, discount use, order row and line items either
+-- all happen or none do. Conflicts (stock gone, discount used up) raise
+-- SQLSTATE PT409, which PostgREST answers with 409.
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION place_order(
+    p_order JSONB,
+    p_items JSONB,
+    p_discount_id UUID DEFAULT NULL
+)
+RETURNS TABLE (order_with_items JSONB)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_order public.orders;
+    v_items JSONB;
+BEGIN
+    -- p_items carry product_id/quantity, so they double as the stock request
+    PERFORM decrement_stock(p_items);
+
+    IF p_discount_id IS NOT NULL THEN
+        UPDATE public.discount_codes
+        SET used_count = COALESCE(used_count, 0) + 1
+        WHERE id = p_discount_id
+          AND is_active
+          AND (max_uses IS NULL OR COALESCE(used_count, 0) < max_uses);
+
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'Discount code is no longer available'
+                USING ERRCODE = 'PT409';
+        END IF;
+    END IF;
+
+    -- order_number, ids and timestamps come from the column defaults
+    INSERT INTO public.orders (
+        shipping_address, shipping_fee, subtotal, discount_amount, total,
+        payment_method, customer_note, delivery_date, delivery_time_slot,
+        order_status, payment_status
+    )
+    SELECT
+        o.shipping_address, o.shipping_fee, o.subtotal, o.discount_amount, o.total,
+        o.payment_method, o.customer_note, o.delivery_date, o.delivery_time_slot,
+        COALESCE(o.order_status, 'pending'), COALESCE(o.payment_status, 'pending')
+    FROM jsonb_populate_record(NULL::public.orders, p_order) AS o
+    RETURNING * INTO v_order;
+
+    WITH inserted AS (
+        INSERT INTO public.order_items (
+            order_id, product_id, variant_id, product_name, variant_name,
+            quantity, unit_price, total_price
+        )
+        SELECT
+            v_order.id, i.product_id, i.variant_id, i.product_name, i.variant_name,
+            i.quantity, i.unit_price, i.total_price
+        FROM jsonb_populate_recordset(NULL::public.order_items, p_items) AS i
+        RETURNING *
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(inserted)), '[]'::jsonb) INTO v_items FROM inserted;
+
+    RETURN QUERY SELECT to_jsonb(v_order) || jsonb_build_object('items', v_items);
+END;
+$$;
+
+COMMENT ON FUNCTION place_order IS 'Atomically take stock, use a discount and insert an order with its items; returns the order JSON with items nested';
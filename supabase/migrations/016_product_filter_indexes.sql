@@ -0,0 +1,20 @@
+-- =====================================================
+-- Migration: Composite indexes for the storefront product list
+-- GET /products filters on is_published = $1 plus optional category and
+-- price bounds, and orders by created_at or price. The asyncpg path
+-- prepares one statement per filter combination; generic plans for those
+-- can't use the partial "WHERE is_published = TRUE" indexes from 006, so
+-- is_published leads these instead.
+-- Price sorts break ties on id so OFFSET pages stay stable, and the
+-- price indexes carry id to serve that order.
+-- (is_published, created_at DESC, id DESC) already exists (009).
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS idx_products_published_category_price
+ON public.products(is_published, category_id, price, id);
+
+CREATE INDEX IF NOT EXISTS idx_products_published_category_created
+ON public.products(is_published, category_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_products_published_price
+ON public.products(is_published, price, id);
@@ -0,0 +1,9 @@
+-- =====================================================
+-- Migration: GIN index on products.tags for storefront search
+-- Search matches name_vi/name_en ILIKE (trigram indexes, 008) OR
+-- tags @> ARRAY[q]. Without an index on tags the whole OR fell back to a
+-- sequential scan; with it the planner can BitmapOr all three.
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS idx_products_tags
+ON public.products USING gin(tags);
@@ -0,0 +1,21 @@
+-- =====================================================
+-- Migration: Batched blog view counts
+-- The API counts views in memory and periodically adds them with one
+-- call, instead of a read-modify-write UPDATE on every page view (which
+-- also lost increments under concurrent reads).
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION increment_blog_views(p_views JSONB)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    UPDATE public.blog_posts AS b
+    SET view_count = b.view_count + v.delta
+    FROM (
+        SELECT key::UUID AS id, value::INT AS delta
+        FROM jsonb_each_text(p_views)
+    ) AS v
+    WHERE b.id = v.id;
+$$;
+
+COMMENT ON FUNCTION increment_blog_views IS 'Add {post_id: views} to blog_posts.view_count in one UPDATE';
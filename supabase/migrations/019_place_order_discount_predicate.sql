@@ -0,0 +1,70 @@
+-- =====================================================
+-- Migration: Validate the discount in the same UPDATE that uses it
+-- The API prices discounts from a row cached for up to a minute. place_order
+-- already re-checked is_active and max_uses when taking a use; the date
+-- window and minimum order value are now part of that predicate too, so a
+-- code edited or expired since it was cached is refused (PT409) atomically.
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION place_order(
+    p_order JSONB,
+    p_items JSONB,
+    p_discount_id UUID DEFAULT NULL
+)
+RETURNS TABLE (order_with_items JSONB)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_order public.orders;
+    v_items JSONB;
+BEGIN
+    -- p_items carry product_id/quantity, so they double as the stock request
+    PERFORM decrement_stock(p_items);
+
+    IF p_discount_id IS NOT NULL THEN
+        UPDATE public.discount_codes
+        SET used_count = COALESCE(used_count, 0) + 1
+        WHERE id = p_discount_id
+          AND is_active
+          AND (starts_at IS NULL OR starts_at <= NOW())
+          AND (expires_at IS NULL OR expires_at > NOW())
+          AND (max_uses IS NULL OR COALESCE(used_count, 0) < max_uses)
+          AND (min_order_value IS NULL OR min_order_value <= (p_order->>'subtotal')::NUMERIC);
+
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'Discount code is no longer available'
+                USING ERRCODE = 'PT409';
+        END IF;
+    END IF;
+
+    -- order_number, ids and timestamps come from the column defaults
+    INSERT INTO public.orders (
+        shipping_address, shipping_fee, subtotal, discount_amount, total,
+        payment_method, customer_note, delivery_date, delivery_time_slot,
+        order_status, payment_status
+    )
+    SELECT
+        o.shipping_address, o.shipping_fee, o.subtotal, o.discount_amount, o.total,
+        o.payment_method, o.customer_note, o.delivery_date, o.delivery_time_slot,
+        COALESCE(o.order_status, 'pending'), COALESCE(o.payment_status, 'pending')
+    FROM jsonb_populate_record(NULL::public.orders, p_order) AS o
+    RETURNING * INTO v_order;
+
+    WITH inserted AS (
+        INSERT INTO public.order_items (
+            order_id, product_id, variant_id, product_name, variant_name,
+            quantity, unit_price, total_price
+        )
+        SELECT
+            v_order.id, i.product_id, i.variant_id, i.product_name, i.variant_name,
+            i.quantity, i.unit_price, i.total_price
+        FROM jsonb_populate_recordset(NULL::public.order_items, p_items) AS i
+        RETURNING *
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(inserted)), '[]'::jsonb) INTO v_items FROM inserted;
+
+    RETURN QUERY SELECT to_jsonb(v_order) || jsonb_build_object('items', v_items);
+END;
+$$;
+
+COMMENT ON FUNCTION place_order IS 'Atomically take stock, use a discount and insert an order with its items; returns the order JSON with items nested';